@@ -24,11 +24,27 @@ if SRC_DIR.exists() and str(SRC_DIR) not in sys.path:
 from app import models  # noqa: E402,F401
 
 config = context.config
-if config.config_file_name:
+if config.config_file_name and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 target_metadata = SQLModel.metadata
 
+# Full-text search objects are managed by hand-written migrations (see app/search.py).
+_UNMANAGED_TABLES = ("task_fts",)
+_UNMANAGED_COLUMNS = {("task", "search_vector")}
+# Expression/INCLUDE indexes created by hand-written migrations.
+_UNMANAGED_INDEXES = ("ix_task_search_vector", "ix_task_list_cover")
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    if type_ == "table" and name.startswith(_UNMANAGED_TABLES):
+        return False
+    if type_ == "column" and (obj.table.name, name) in _UNMANAGED_COLUMNS:
+        return False
+    if type_ == "index" and name in _UNMANAGED_INDEXES:
+        return False
+    return True
+
 
 def _get_db_url() -> str:
     """Resolve DB URL from CLI (-x), env, ini, or fallback sqlite."""
@@ -53,6 +69,7 @@ def run_migrations_offline():
         url=url,
         target_metadata=target_metadata,
         literal_binds=True,
+        include_object=include_object,
         compare_type=True,
         compare_server_default=True,
         render_as_batch=url.startswith("sqlite"),
@@ -77,6 +94,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_object=include_object,
             compare_type=True,
             compare_server_default=True,
             render_as_batch=connection.engine.url.get_backend_name() == "sqlite",
@@ -0,0 +1,28 @@
+"""add task keyset index
+
+Revision ID: 3f599fef38f7
+Revises: 3aa1b4305414
+Create Date: 2026-10-18 09:12:40.512331
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision = "3f599fef38f7"
+down_revision = "3aa1b4305414"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # (completed, tag) equality filters followed by an id range scan: lets cursor
+    # pagination on GET /tasks/ seek straight to the next page.
+    insp = sa.inspect(op.get_bind())
+    existing = {ix["name"] for ix in insp.get_indexes("task")}
+    if "ix_task_completed_tag_id" not in existing:
+        op.create_index("ix_task_completed_tag_id", "task", ["completed", "tag", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_completed_tag_id", table_name="task")
@@ -0,0 +1,49 @@
+"""add task version and updated_at
+
+Revision ID: 5b7d0c3e1f92
+Revises: 8c1e2f4a9b7d
+Create Date: 2026-10-18 13:40:55.118204
+"""
+
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision = "5b7d0c3e1f92"
+down_revision = "8c1e2f4a9b7d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Plain ADD COLUMN rather than batch mode: a SQLite table rebuild would drop the
+    # FTS triggers on task. SQLite also refuses a non-constant default here, so
+    # existing rows are stamped with an UPDATE instead.
+    op.add_column(
+        "task", sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("1"))
+    )
+    op.add_column(
+        "task",
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            nullable=False,
+            server_default=sa.text("'1970-01-01 00:00:00'"),
+        ),
+    )
+    # A bound naive-UTC datetime, as the app writes it: CURRENT_TIMESTAMP has no
+    # microseconds on SQLite (so If-Match, which binds them, never matched these rows)
+    # and follows the session time zone on Postgres.
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    op.execute(
+        sa.text("UPDATE task SET updated_at = :now").bindparams(
+            sa.bindparam("now", now, type_=sa.DateTime())
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("task", "updated_at")
+    op.drop_column("task", "version")
@@ -0,0 +1,62 @@
+"""add task full text search
+
+Revision ID: 8c1e2f4a9b7d
+Revises: 3f599fef38f7
+Create Date: 2026-10-18 11:02:17.904215
+"""
+
+from alembic import op
+
+revision = "8c1e2f4a9b7d"
+down_revision = "3f599fef38f7"
+branch_labels = None
+depends_on = None
+
+PG_UPGRADE = (
+    "ALTER TABLE task ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '') "
+    "|| ' ' || coalesce(tag, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_task_search_vector ON task USING gin (search_vector)",
+)
+PG_DOWNGRADE = (
+    "DROP INDEX IF EXISTS ix_task_search_vector",
+    "ALTER TABLE task DROP COLUMN IF EXISTS search_vector",
+)
+
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+    "title, description, tag, content='task', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_fts(rowid, title, description, tag) "
+    "VALUES (new.id, new.title, new.description, new.tag); END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description, tag) "
+    "VALUES ('delete', old.id, old.title, old.description, old.tag); END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description, tag ON task "
+    "BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description, tag) "
+    "VALUES ('delete', old.id, old.title, old.description, old.tag); "
+    "INSERT INTO task_fts(rowid, title, description, tag) "
+    "VALUES (new.id, new.title, new.description, new.tag); END",
+    "INSERT INTO task_fts(task_fts) VALUES ('rebuild')",
+)
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS task_fts_au",
+    "DROP TRIGGER IF EXISTS task_fts_ad",
+    "DROP TRIGGER IF EXISTS task_fts_ai",
+    "DROP TABLE IF EXISTS task_fts",
+)
+
+
+def _run(pg: tuple, sqlite: tuple) -> None:
+    dialect = op.get_bind().dialect.name
+    for stmt in {"postgresql": pg, "sqlite": sqlite}.get(dialect, ()):
+        op.execute(stmt)
+
+
+def upgrade() -> None:
+    _run(PG_UPGRADE, SQLITE_UPGRADE)
+
+
+def downgrade() -> None:
+    _run(PG_DOWNGRADE, SQLITE_DOWNGRADE)
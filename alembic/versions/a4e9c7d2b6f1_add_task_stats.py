@@ -0,0 +1,89 @@
+"""add task_stats counters
+
+Revision ID: a4e9c7d2b6f1
+Revises: 5b7d0c3e1f92
+Create Date: 2026-10-18 20:12:31.406218
+"""
+
+import sqlalchemy as sa
+import sqlmodel
+
+from alembic import op
+
+revision = "a4e9c7d2b6f1"
+down_revision = "5b7d0c3e1f92"
+branch_labels = None
+depends_on = None
+
+# Same DDL as app/stats.py at the time of this revision.
+SQLITE_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS task_stats_ai AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_stats(tag, total, completed) "
+    "VALUES (coalesce(new.tag, ''), 1, new.completed) "
+    "ON CONFLICT(tag) DO UPDATE SET total = total + 1, "
+    "completed = completed + excluded.completed; END",
+    "CREATE TRIGGER IF NOT EXISTS task_stats_ad AFTER DELETE ON task BEGIN "
+    "UPDATE task_stats SET total = total - 1, completed = completed - old.completed "
+    "WHERE tag = coalesce(old.tag, ''); END",
+    "CREATE TRIGGER IF NOT EXISTS task_stats_au AFTER UPDATE OF tag, completed ON task BEGIN "
+    "UPDATE task_stats SET total = total - 1, completed = completed - old.completed "
+    "WHERE tag = coalesce(old.tag, ''); "
+    "INSERT INTO task_stats(tag, total, completed) "
+    "VALUES (coalesce(new.tag, ''), 1, new.completed) "
+    "ON CONFLICT(tag) DO UPDATE SET total = total + 1, "
+    "completed = completed + excluded.completed; END",
+)
+
+PG_DDL = (
+    "CREATE OR REPLACE FUNCTION task_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$ "
+    "BEGIN "
+    "IF TG_OP IN ('DELETE', 'UPDATE') THEN "
+    "UPDATE task_stats SET total = total - 1, completed = completed - OLD.completed::int "
+    "WHERE tag = coalesce(OLD.tag, ''); "
+    "END IF; "
+    "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+    "INSERT INTO task_stats AS s (tag, total, completed) "
+    "VALUES (coalesce(NEW.tag, ''), 1, NEW.completed::int) "
+    "ON CONFLICT (tag) DO UPDATE SET total = s.total + 1, "
+    "completed = s.completed + excluded.completed; "
+    "END IF; "
+    "RETURN NULL; "
+    "END $$",
+    "DROP TRIGGER IF EXISTS task_stats_trg ON task",
+    "CREATE TRIGGER task_stats_trg AFTER INSERT OR DELETE OR UPDATE OF tag, completed ON task "
+    "FOR EACH ROW EXECUTE FUNCTION task_stats_apply()",
+)
+
+BACKFILL = (
+    "INSERT INTO task_stats (tag, total, completed) "
+    "SELECT coalesce(tag, ''), count(*), sum(CAST(completed AS INTEGER)) "
+    "FROM task GROUP BY coalesce(tag, '')"
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_stats",
+        sa.Column("tag", sqlmodel.sql.sqltypes.AutoString(length=50), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("completed", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("tag"),
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        # No writer may slip in between the backfill and the trigger going live.
+        op.execute("LOCK TABLE task IN SHARE MODE")
+    for stmt in {"postgresql": PG_DDL, "sqlite": SQLITE_DDL}.get(dialect, ()):
+        op.execute(stmt)
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP TRIGGER IF EXISTS task_stats_trg ON task")
+        op.execute("DROP FUNCTION IF EXISTS task_stats_apply()")
+    elif dialect == "sqlite":
+        for name in ("task_stats_au", "task_stats_ad", "task_stats_ai"):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_table("task_stats")
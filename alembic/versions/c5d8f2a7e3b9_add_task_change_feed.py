@@ -0,0 +1,82 @@
+"""add task_change log for the change feed
+
+Revision ID: c5d8f2a7e3b9
+Revises: b7c3e5a1d9f4
+Create Date: 2026-10-18 23:05:47.530916
+"""
+
+import sqlalchemy as sa
+import sqlmodel
+
+from alembic import op
+
+revision = "c5d8f2a7e3b9"
+down_revision = "b7c3e5a1d9f4"
+branch_labels = None
+depends_on = None
+
+# Same DDL as app/changes.py at the time of this revision.
+_INSERT = "INSERT INTO task_change(op, task_id, tag, prev_tag, version) "
+SQLITE_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS task_change_ai AFTER INSERT ON task BEGIN "
+    + _INSERT
+    + "VALUES ('created', new.id, new.tag, NULL, new.version); END",
+    "CREATE TRIGGER IF NOT EXISTS task_change_au AFTER UPDATE ON task BEGIN "
+    + _INSERT
+    + "VALUES (CASE WHEN new.completed AND NOT old.completed THEN 'completed' "
+    "ELSE 'updated' END, new.id, new.tag, "
+    "CASE WHEN old.tag IS NOT new.tag THEN old.tag END, new.version); END",
+    "CREATE TRIGGER IF NOT EXISTS task_change_ad AFTER DELETE ON task BEGIN "
+    + _INSERT
+    + "VALUES ('deleted', old.id, old.tag, NULL, old.version); END",
+)
+
+PG_DDL = (
+    "CREATE OR REPLACE FUNCTION task_change_log() RETURNS trigger LANGUAGE plpgsql AS $$ "
+    "BEGIN "
+    "IF TG_OP = 'INSERT' THEN "
+    + _INSERT
+    + "VALUES ('created', NEW.id, NEW.tag, NULL, NEW.version); "
+    "ELSIF TG_OP = 'UPDATE' THEN "
+    + _INSERT
+    + "VALUES (CASE WHEN NEW.completed AND NOT OLD.completed THEN 'completed' "
+    "ELSE 'updated' END, NEW.id, NEW.tag, "
+    "CASE WHEN OLD.tag IS DISTINCT FROM NEW.tag THEN OLD.tag END, NEW.version); "
+    "ELSE " + _INSERT + "VALUES ('deleted', OLD.id, OLD.tag, NULL, OLD.version); "
+    "END IF; "
+    "PERFORM pg_notify('task_changes', ''); "
+    "RETURN NULL; "
+    "END $$",
+    "DROP TRIGGER IF EXISTS task_change_trg ON task",
+    "CREATE TRIGGER task_change_trg AFTER INSERT OR UPDATE OR DELETE ON task "
+    "FOR EACH ROW EXECUTE FUNCTION task_change_log()",
+)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    id_type = sa.BigInteger() if dialect == "postgresql" else sa.Integer()
+    op.create_table(
+        "task_change",
+        sa.Column("id", id_type, nullable=False),
+        sa.Column("op", sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column("tag", sqlmodel.sql.sqltypes.AutoString(length=50), nullable=True),
+        sa.Column("prev_tag", sqlmodel.sql.sqltypes.AutoString(length=50), nullable=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sqlite_autoincrement=True,
+    )
+    for stmt in {"postgresql": PG_DDL, "sqlite": SQLITE_DDL}.get(dialect, ()):
+        op.execute(stmt)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP TRIGGER IF EXISTS task_change_trg ON task")
+        op.execute("DROP FUNCTION IF EXISTS task_change_log()")
+    elif dialect == "sqlite":
+        for name in ("task_change_ad", "task_change_au", "task_change_ai"):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_table("task_change")
@@ -0,0 +1,223 @@
+"""Adaptive admission control in front of the DB pool.
+
+Without it, when the database slows down every request still enters the app
+and waits in the threadpool for a pool connection until ``pool_timeout``, so
+latency grows for everyone. ``AdmissionMiddleware`` caps the requests in
+flight at an adaptive limit:
+
+- Each request's latency (to the start of its response) feeds an EWMA. When the
+  EWMA is above ``ADMISSION_TARGET_MS``, or a request fails with a 5xx, the
+  limit is cut by 10%, at most once per ``limit`` completed requests. When
+  latency is on target and the limit was actually reached, it grows by
+  ``1/limit`` per request (AIMD), between ``ADMISSION_MIN_LIMIT`` and
+  ``ADMISSION_MAX_LIMIT``.
+- Requests over the limit wait in a queue of ``ADMISSION_QUEUE_SIZE`` for up to
+  ``ADMISSION_QUEUE_TIMEOUT_MS``. Writes are admitted before reads, and a write
+  that finds the queue full takes the place of the newest queued read.
+- Everything else gets ``503`` with ``Retry-After`` before any DB work.
+
+``ADMISSION_EXEMPT_PATHS`` (health checks, metrics, the long-lived change
+stream, which holds no DB connection) bypass it. Streaming responses that do
+hold a connection until their body is sent (``ADMISSION_STREAM_PATHS``, the
+export) would pin slots for far longer than the latency they report, so they
+get a separate cap of ``ADMISSION_STREAM_LIMIT`` concurrent streams instead of
+a slot. The limits are per worker. Watch ``admission_limit``,
+``admission_queue_depth`` and ``admission_shed_total``.
+"""
+
+import asyncio
+import math
+import os
+from collections import deque
+from time import perf_counter
+from typing import Deque, Optional
+
+from prometheus_client import Counter, Gauge
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") in ("1", "true", "True")
+INITIAL_LIMIT = int(os.getenv("ADMISSION_INITIAL_LIMIT", "20"))
+MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "4"))
+MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", "200"))
+TARGET_MS = float(os.getenv("ADMISSION_TARGET_MS", "300"))
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "50"))
+QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "500"))
+EXEMPT_PATHS = frozenset(
+    p.strip()
+    for p in os.getenv("ADMISSION_EXEMPT_PATHS", "/health,/metrics,/tasks/changes").split(",")
+    if p.strip()
+)
+STREAM_PATHS = frozenset(
+    p.strip() for p in os.getenv("ADMISSION_STREAM_PATHS", "/tasks/export").split(",") if p.strip()
+)
+STREAM_LIMIT = int(os.getenv("ADMISSION_STREAM_LIMIT", "2"))
+BACKOFF = 0.9
+SMOOTHING = 0.2
+_READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+LIMIT = Gauge("admission_limit", "Current adaptive concurrency limit.")
+INFLIGHT = Gauge("admission_inflight", "Requests admitted and not yet finished.")
+QUEUE_DEPTH = Gauge("admission_queue_depth", "Requests waiting for admission.")
+STREAMS = Gauge("admission_streams", "Open responses on ADMISSION_STREAM_PATHS.")
+SHED = Counter(
+    "admission_shed_total",
+    "Requests rejected with 503 by admission control.",
+    ["reason"],  # queue_full | timeout | evicted | stream_limit
+)
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: int = INITIAL_LIMIT,
+        min_limit: int = MIN_LIMIT,
+        max_limit: int = MAX_LIMIT,
+        target_ms: float = TARGET_MS,
+        queue_size: int = QUEUE_SIZE,
+        queue_timeout_ms: float = QUEUE_TIMEOUT_MS,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target = target_ms / 1000
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.inflight = 0
+        self.latency: Optional[float] = None  # EWMA, seconds
+        self._since_cut = 0
+        self._writes: Deque[asyncio.Future] = deque()
+        self._reads: Deque[asyncio.Future] = deque()
+        LIMIT.set(self.limit)
+
+    def queued(self) -> int:
+        return len(self._writes) + len(self._reads)
+
+    async def acquire(self, write: bool = False) -> Optional[str]:
+        """``None`` once admitted (call ``release`` after); otherwise why it was shed."""
+        if self.inflight < int(self.limit) and not self.queued():
+            self._admit()
+            return None
+        if self.queued() >= self.queue_size:
+            evicted = self._reads.pop() if write and self._reads else None
+            if evicted is None:
+                return "queue_full"
+            if not evicted.done():
+                evicted.set_result("evicted")
+        waiter = asyncio.get_running_loop().create_future()
+        (self._writes if write else self._reads).append(waiter)
+        QUEUE_DEPTH.set(self.queued())
+        try:
+            return await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return waiter.result()  # admitted (or evicted) as the timeout fired
+            return "timeout"
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.result() is None:
+                self.release()  # admitted just as the client went away
+            raise
+        finally:
+            for queue in (self._writes, self._reads):
+                if waiter in queue:
+                    queue.remove(waiter)
+            QUEUE_DEPTH.set(self.queued())
+
+    def release(self, latency: Optional[float] = None, failed: bool = False) -> None:
+        saturated = self.inflight >= int(self.limit)
+        self.inflight -= 1
+        INFLIGHT.set(self.inflight)
+        if latency is not None:
+            self._observe(latency, failed, saturated)
+        while self.inflight < int(self.limit) and self.queued():
+            waiter = (self._writes or self._reads).popleft()
+            if not waiter.done():
+                self._admit()
+                waiter.set_result(None)
+        QUEUE_DEPTH.set(self.queued())
+
+    def _admit(self) -> None:
+        self.inflight += 1
+        INFLIGHT.set(self.inflight)
+
+    def _observe(self, latency: float, failed: bool, saturated: bool) -> None:
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += SMOOTHING * (latency - self.latency)
+        self._since_cut += 1
+        if failed or self.latency > self.target:
+            # One cut per round of requests, so a burst of slow ones does not collapse it.
+            if self._since_cut >= self.limit:
+                self.limit = max(self.min_limit, self.limit * BACKOFF)
+                self._since_cut = 0
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        LIMIT.set(self.limit)
+
+
+admission_limiter = AdaptiveLimiter()
+
+
+class AdmissionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: Optional[AdaptiveLimiter] = None,
+        stream_limit: int = STREAM_LIMIT,
+    ):
+        self.app = app
+        self.limiter = limiter or admission_limiter
+        self.stream_limit = stream_limit
+        self.streams = 0
+        self.retry_after = str(max(1, math.ceil(self.limiter.queue_timeout))).encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] in STREAM_PATHS:
+            await self._stream(scope, receive, send)
+            return
+
+        reason = await self.limiter.acquire(write=scope["method"] not in _READ_METHODS)
+        if reason is not None:
+            await self._shed(reason, scope, receive, send)
+            return
+
+        start = perf_counter()
+        latency, status, failed = None, 0, False
+
+        async def _send(message: Message):
+            nonlocal latency, status
+            if message["type"] == "http.response.start":
+                latency, status = perf_counter() - start, message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if latency is None:
+                latency = perf_counter() - start
+            self.limiter.release(latency, failed or status >= 500)
+
+    async def _stream(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.streams >= self.stream_limit:
+            await self._shed("stream_limit", scope, receive, send)
+            return
+        self.streams += 1
+        STREAMS.set(self.streams)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.streams -= 1
+            STREAMS.set(self.streams)
+
+    async def _shed(self, reason: str, scope: Scope, receive: Receive, send: Send) -> None:
+        SHED.labels(reason).inc()
+        response = JSONResponse({"detail": "Server busy, retry later"}, status_code=503)
+        response.raw_headers.append((b"retry-after", self.retry_after))
+        await response(scope, receive, send)
@@ -0,0 +1,138 @@
+"""Batched task writes: /tasks/bulk.
+
+Each endpoint takes a JSON array (or NDJSON with ``Content-Type:
+application/x-ndjson``), validates items individually and runs every valid item
+in one transaction. The response carries a result per input item, in order.
+"""
+
+import json
+import os
+from typing import Any, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import TypeAdapter, ValidationError
+from starlette.requests import Request
+
+from app import crud
+from app.cache import task_cache
+from app.db import get_session, run_db
+from app.schemas import BulkItemResult, BulkResult, TaskIn, TaskPatch
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+router = APIRouter(prefix="/tasks/bulk", tags=["bulk"])
+
+_task_in = TypeAdapter(TaskIn)
+_task_patch = TypeAdapter(TaskPatch)
+_task_id = TypeAdapter(int)
+
+
+def _body_schema(item_schema: dict) -> dict:
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": item_schema}},
+                "application/x-ndjson": {"schema": item_schema},
+            },
+        }
+    }
+
+
+async def _read_items(request: Request) -> List[Any]:
+    raw = await request.body()
+    ctype = request.headers.get("content-type", "")
+    try:
+        if ctype.startswith(NDJSON_TYPES):
+            items = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        else:
+            items = json.loads(raw)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Malformed JSON body") from exc
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Expected a JSON array")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per request")
+    return items
+
+
+def _validate(
+    items: List[Any], adapter: TypeAdapter
+) -> Tuple[List[Optional[BulkItemResult]], List[Tuple[int, Any]]]:
+    results: List[Optional[BulkItemResult]] = [None] * len(items)
+    valid = []
+    for i, item in enumerate(items):
+        try:
+            valid.append((i, adapter.validate_python(item)))
+        except ValidationError as exc:
+            msg = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+            results[i] = BulkItemResult(index=i, status=422, error=msg)
+    return results, valid
+
+
+def _not_found(index: int, task_id: int) -> BulkItemResult:
+    return BulkItemResult(index=index, status=404, id=task_id, error="Task not found")
+
+
+@router.post("", response_model=BulkResult, openapi_extra=_body_schema(TaskIn.model_json_schema()))
+async def bulk_create_tasks(request: Request, session=Depends(get_session)):
+    results, valid = _validate(await _read_items(request), _task_in)
+    created = await run_db(session, crud.bulk_create, [body.model_dump() for _, body in valid])
+    if created:
+        await task_cache.invalidate()
+    for (i, _), row in zip(valid, created):
+        results[i] = BulkItemResult(index=i, status=201, id=row["id"], task=row)
+    return BulkResult(results=results)
+
+
+@router.patch(
+    "", response_model=BulkResult, openapi_extra=_body_schema(TaskPatch.model_json_schema())
+)
+async def bulk_update_tasks(request: Request, session=Depends(get_session)):
+    results, valid = _validate(await _read_items(request), _task_patch)
+    rows = [patch.model_dump(exclude_unset=True) | {"id": patch.id} for _, patch in valid]
+    updated = await run_db(session, crud.bulk_update, rows)
+    if updated:
+        await task_cache.invalidate(updated)
+    for i, patch in valid:
+        row = updated.get(patch.id)
+        results[i] = (
+            BulkItemResult(index=i, status=200, id=patch.id, task=row)
+            if row
+            else _not_found(i, patch.id)
+        )
+    return BulkResult(results=results)
+
+
+@router.post(
+    "/complete", response_model=BulkResult, openapi_extra=_body_schema({"type": "integer"})
+)
+async def bulk_complete_tasks(request: Request, session=Depends(get_session)):
+    results, valid = _validate(await _read_items(request), _task_id)
+    completed = await run_db(session, crud.bulk_complete, [task_id for _, task_id in valid])
+    if completed:
+        await task_cache.invalidate(completed)
+    for i, task_id in valid:
+        row = completed.get(task_id)
+        results[i] = (
+            BulkItemResult(index=i, status=200, id=task_id, task=row)
+            if row
+            else _not_found(i, task_id)
+        )
+    return BulkResult(results=results)
+
+
+@router.post("/delete", response_model=BulkResult, openapi_extra=_body_schema({"type": "integer"}))
+async def bulk_delete_tasks(request: Request, session=Depends(get_session)):
+    results, valid = _validate(await _read_items(request), _task_id)
+    deleted = await run_db(session, crud.bulk_delete, [task_id for _, task_id in valid])
+    if deleted:
+        await task_cache.invalidate(deleted)
+    for i, task_id in valid:
+        results[i] = (
+            BulkItemResult(index=i, status=204, id=task_id)
+            if task_id in deleted
+            else _not_found(i, task_id)
+        )
+    return BulkResult(results=results)
@@ -0,0 +1,198 @@
+"""Read-through cache for task reads.
+
+GET /tasks/{id} entries are keyed by id and dropped when that task is written.
+List pages (and list totals) are keyed by their normalized query plus a
+generation number. Every write bumps the generation, which invalidates all
+cached pages at once without tracking which pages held which rows.
+
+``CACHE_BACKEND=memory`` is a per-process LRU bounded by ``CACHE_MAX_ENTRIES``
+and ``CACHE_TTL_SECS``. A write only invalidates the worker that handled it; the
+others keep serving the old row (and its ETag) until their copy expires, which
+breaks read-your-writes and turns the next If-Match into a false 412. So the
+cache is off by default unless ``CACHE_BACKEND=redis``, which shares entries and
+invalidation across workers through ``CACHE_REDIS_URL``. ``CACHE_ENABLED=1``
+with the memory backend is only safe with a single worker.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+import orjson
+from prometheus_client import Counter
+
+from app.singleflight import read_flights
+
+log = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+# Off by default for the per-worker memory backend (see above).
+_ENABLED_DEFAULT = "1" if CACHE_BACKEND == "redis" else "0"
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", _ENABLED_DEFAULT) in ("1", "true", "True")
+CACHE_TTL_SECS = float(os.getenv("CACHE_TTL_SECS", "5"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+
+CACHE_REQUESTS = Counter(
+    "task_cache_requests_total",
+    "Task read cache lookups.",
+    ["kind", "result"],
+)
+
+_GEN_KEY = "tasks:gen"
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._data: OrderedDict = OrderedDict()
+        self._gen = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < self.clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._data[key] = (self.clock() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def generation(self) -> int:
+        return self._gen
+
+    async def bump_generation(self) -> None:
+        self._gen += 1
+
+
+class RedisBackend:
+    """Entries as JSON strings with EX; errors degrade to cache misses."""
+
+    def __init__(self, client, prefix: str = "cache"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        import redis.asyncio as redis  # optional dependency, only needed for CACHE_BACKEND=redis
+
+        return cls(redis.from_url(url))
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self.client.get(f"{self.prefix}:{key}")
+        except Exception:
+            log.warning("Cache backend unavailable", exc_info=True)
+            return None
+        return None if raw is None else orjson.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        try:
+            await self.client.set(f"{self.prefix}:{key}", orjson.dumps(value), px=int(ttl * 1000))
+        except Exception:
+            log.warning("Cache backend unavailable", exc_info=True)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        keys = [f"{self.prefix}:{k}" for k in keys]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def generation(self) -> int:
+        try:
+            return int(await self.client.get(f"{self.prefix}:{_GEN_KEY}") or 0)
+        except Exception:
+            log.warning("Cache backend unavailable", exc_info=True)
+            return -1
+
+    async def bump_generation(self) -> None:
+        await self.client.incr(f"{self.prefix}:{_GEN_KEY}")
+
+
+class TaskCache:
+    def __init__(self, backend, ttl: float = CACHE_TTL_SECS, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+
+    async def generation(self) -> int:
+        """Snapshot taken before a DB read; pass it back to ``set_*``."""
+        return await self.backend.generation() if self.enabled else -1
+
+    async def get_task(self, task_id: int) -> Optional[dict]:
+        return await self._get("task", f"task:{task_id}")
+
+    async def set_task(self, task_id: int, data: dict, gen: int) -> None:
+        # A write that landed during our DB read may already have invalidated this id;
+        # only populate if nothing was written since the snapshot.
+        if self.enabled and gen >= 0 and gen == await self.backend.generation():
+            await self.backend.set(f"task:{task_id}", data, self.ttl)
+
+    async def get_list(self, params: dict, gen: int) -> Optional[list]:
+        return await self._get("list", self._list_key(params, gen))
+
+    async def set_list(self, params: dict, gen: int, items: list) -> None:
+        if self.enabled and gen >= 0:
+            await self.backend.set(self._list_key(params, gen), items, self.ttl)
+
+    async def get_count(self, filters: dict, gen: int) -> Optional[list]:
+        return await self._get("count", self._list_key({"count": filters}, gen))
+
+    async def set_count(self, filters: dict, gen: int, total: list) -> None:
+        if self.enabled and gen >= 0:
+            await self.backend.set(self._list_key({"count": filters}, gen), total, self.ttl)
+
+    async def invalidate(self, task_ids: Iterable[int] = ()) -> None:
+        read_flights.forget()
+        if not self.enabled:
+            return
+        try:
+            await self.backend.bump_generation()
+            await self.backend.delete([f"task:{i}" for i in task_ids])
+        except Exception:
+            log.warning("Cache invalidation failed", exc_info=True)
+
+    async def _get(self, kind: str, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        value = await self.backend.get(key)
+        CACHE_REQUESTS.labels(kind, "miss" if value is None else "hit").inc()
+        return value
+
+    @staticmethod
+    def _list_key(params: dict, gen: int) -> str:
+        return f"list:{gen}:" + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+def build_cache() -> TaskCache:
+    if CACHE_BACKEND == "redis":
+        backend = RedisBackend.from_url(os.environ["CACHE_REDIS_URL"])
+    elif CACHE_BACKEND == "memory":
+        if CACHE_ENABLED and int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+            log.warning(
+                "CACHE_BACKEND=memory is per worker: with WEB_CONCURRENCY>1 reads can miss "
+                "writes made by another worker for up to CACHE_TTL_SECS"
+            )
+        backend = MemoryBackend(CACHE_MAX_ENTRIES)
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND!r}")
+    return TaskCache(backend, enabled=CACHE_ENABLED)
+
+
+task_cache = build_cache()
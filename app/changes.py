@@ -0,0 +1,395 @@
+"""GET /tasks/changes: a Server-Sent Events feed of task writes.
+
+Triggers on ``task`` append one ``task_change`` row per created, updated,
+completed or deleted task, in the writing transaction. The row id is the SSE
+event id. The Alembic migration installs the triggers. For ``create_all``
+databases the ``after_create`` hook below installs them.
+
+Each worker runs one ``ChangeFeed`` while it has subscribers: the first one
+starts it and it stops (with its LISTEN connection) when the last one leaves.
+It reads new ``task_change`` rows and fans them out to its SSE clients,
+filtered by ``?tag=``. It polls when woken:
+
+- Postgres: the trigger also sends ``NOTIFY task_changes`` and a listener
+  thread holds one ``LISTEN`` connection per worker.
+- Any database: a commit that wrote through a Session in this process wakes it
+  too (the in-process path SQLite relies on).
+- Otherwise every ``CHANGES_POLL_SECS``, which picks up other processes'
+  writes on SQLite and anything a dropped LISTEN connection missed.
+
+Clients resume with ``Last-Event-ID``: rows after it are replayed from
+``task_change``, which keeps the last ``CHANGES_RETENTION`` rows
+(``retention_loop``, run by every worker's lifespan whether or not anyone is
+subscribed). If the
+client is further behind than that (or ``CHANGES_BACKFILL_MAX``), it gets an
+``event: reset`` and should reload ``GET /tasks/``.
+
+Each client has a queue of ``CHANGES_CLIENT_BUFFER`` events. A client that
+lets it fill up is disconnected rather than buffered without bound. EventSource
+reconnects on its own and resumes from its last id.
+
+On Postgres, sequence values are handed out before commit, so a row can become
+visible after rows with higher ids. Missing ids are re-checked for
+``CHANGES_GAP_SECS``, so such late rows are still delivered, slightly out of
+order.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from time import monotonic
+from typing import Dict, Optional, Set
+
+import orjson
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter, Gauge
+from sqlalchemy import DDL, delete, event, func, or_, text
+from sqlalchemy.orm import Session as _OrmSession
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel, create_engine, select
+
+from app.db import DATABASE_URL, run_in_session
+from app.models import TaskChange
+
+CLIENT_BUFFER = int(os.getenv("CHANGES_CLIENT_BUFFER", "256"))
+POLL_SECS = float(os.getenv("CHANGES_POLL_SECS", "1"))
+HEARTBEAT_SECS = float(os.getenv("CHANGES_HEARTBEAT_SECS", "15"))
+RETENTION = int(os.getenv("CHANGES_RETENTION", "100000"))
+BACKFILL_MAX = int(os.getenv("CHANGES_BACKFILL_MAX", "1000"))
+GAP_SECS = float(os.getenv("CHANGES_GAP_SECS", "5"))
+PRUNE_SECS = 60.0
+PRUNE_LOCK_KEY = 0x7461736B63  # "taskc"
+BATCH = 500
+MAX_GAPS = 1000
+CHANNEL = "task_changes"
+RETRY_MS = 2000
+
+log = logging.getLogger(__name__)
+
+SUBSCRIBERS = Gauge("task_changes_subscribers", "Open /tasks/changes streams in this worker.")
+EVENTS = Counter("task_changes_events_total", "Task change events read from task_change.")
+DISCONNECTS = Counter(
+    "task_changes_slow_client_disconnects_total", "Streams closed because their buffer was full."
+)
+
+_INSERT = "INSERT INTO task_change(op, task_id, tag, prev_tag, version) "
+SQLITE_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS task_change_ai AFTER INSERT ON task BEGIN "
+    + _INSERT
+    + "VALUES ('created', new.id, new.tag, NULL, new.version); END",
+    "CREATE TRIGGER IF NOT EXISTS task_change_au AFTER UPDATE ON task BEGIN "
+    + _INSERT
+    + "VALUES (CASE WHEN new.completed AND NOT old.completed THEN 'completed' "
+    "ELSE 'updated' END, new.id, new.tag, "
+    "CASE WHEN old.tag IS NOT new.tag THEN old.tag END, new.version); END",
+    "CREATE TRIGGER IF NOT EXISTS task_change_ad AFTER DELETE ON task BEGIN "
+    + _INSERT
+    + "VALUES ('deleted', old.id, old.tag, NULL, old.version); END",
+)
+
+PG_DDL = (
+    "CREATE OR REPLACE FUNCTION task_change_log() RETURNS trigger LANGUAGE plpgsql AS $$ "
+    "BEGIN "
+    "IF TG_OP = 'INSERT' THEN "
+    + _INSERT
+    + "VALUES ('created', NEW.id, NEW.tag, NULL, NEW.version); "
+    "ELSIF TG_OP = 'UPDATE' THEN "
+    + _INSERT
+    + "VALUES (CASE WHEN NEW.completed AND NOT OLD.completed THEN 'completed' "
+    "ELSE 'updated' END, NEW.id, NEW.tag, "
+    "CASE WHEN OLD.tag IS DISTINCT FROM NEW.tag THEN OLD.tag END, NEW.version); "
+    "ELSE " + _INSERT + "VALUES ('deleted', OLD.id, OLD.tag, NULL, OLD.version); "
+    "END IF; "
+    # Identical notifications are folded into one per transaction.
+    "PERFORM pg_notify('task_changes', ''); RETURN NULL; END $$",
+    "DROP TRIGGER IF EXISTS task_change_trg ON task",
+    "CREATE TRIGGER task_change_trg AFTER INSERT OR UPDATE OR DELETE ON task "
+    "FOR EACH ROW EXECUTE FUNCTION task_change_log()",
+)
+
+for _stmt in SQLITE_DDL:
+    event.listen(SQLModel.metadata, "after_create", DDL(_stmt).execute_if(dialect="sqlite"))
+for _stmt in PG_DDL:
+    event.listen(SQLModel.metadata, "after_create", DDL(_stmt).execute_if(dialect="postgresql"))
+
+_COLUMNS = tuple(TaskChange.__table__.c)
+
+
+def changes_since(session, after: int, also: Set[int] = frozenset(), limit: int = BATCH):
+    """``task_change`` rows with id above ``after`` (plus the ids in ``also``), oldest first."""
+    cond = TaskChange.id > after
+    if also:
+        cond = or_(cond, TaskChange.id.in_(also))
+    stmt = select(*_COLUMNS).where(cond).order_by(TaskChange.id).limit(limit)
+    return [dict(r) for r in session.exec(stmt).mappings()]
+
+
+def latest_id(session) -> int:
+    return session.exec(select(func.coalesce(func.max(TaskChange.id), 0))).one()
+
+
+def backfill(session, after: int, tag: Optional[str] = None, limit: int = BACKFILL_MAX):
+    """Rows after ``after`` for a resuming client; ``None`` if it cannot resume."""
+    oldest = session.exec(select(func.min(TaskChange.id))).one()
+    if oldest is not None and oldest > after + 1:
+        return None  # pruned past the client's position
+    stmt = select(*_COLUMNS).where(TaskChange.id > after)
+    if tag is not None:
+        stmt = stmt.where(or_(TaskChange.tag == tag, TaskChange.prev_tag == tag))
+    rows = [dict(r) for r in session.exec(stmt.order_by(TaskChange.id).limit(limit + 1)).mappings()]
+    return None if len(rows) > limit else rows
+
+
+def prune(session, keep: int = RETENTION) -> int:
+    """Delete all but the newest ``keep`` rows; returns how many went.
+
+    On Postgres a transaction-scoped advisory lock lets one worker prune per round;
+    the others skip instead of deleting the same rows again.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        locked = session.execute(
+            text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": PRUNE_LOCK_KEY}
+        )
+        if not locked.scalar():
+            session.rollback()
+            return 0
+    newest = latest_id(session)
+    deleted = session.exec(delete(TaskChange).where(TaskChange.id <= newest - keep)).rowcount
+    session.commit()
+    return deleted
+
+
+async def retention_loop(
+    runner=run_in_session, keep: int = RETENTION, interval: float = PRUNE_SECS
+):
+    """Prune ``task_change`` every ``interval`` seconds; started from the app lifespan.
+
+    The triggers log every write whether or not anyone subscribes, so retention
+    cannot depend on the feed running.
+    """
+    while True:
+        try:
+            await runner(prune, keep)
+        except Exception:
+            log.exception("Pruning task_change failed")
+        await asyncio.sleep(interval)
+
+
+class Subscriber:
+    __slots__ = ("tag", "queue")
+
+    def __init__(self, tag: Optional[str], size: int):
+        self.tag = tag
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+
+    def wants(self, change: dict) -> bool:
+        return self.tag is None or self.tag in (change["tag"], change["prev_tag"])
+
+
+class ChangeFeed:
+    """One per worker: reads ``task_change`` and fans rows out to subscribers."""
+
+    def __init__(
+        self,
+        runner=run_in_session,
+        listen_url: Optional[str] = None,
+        client_buffer: int = CLIENT_BUFFER,
+        poll_secs: float = POLL_SECS,
+    ):
+        self.runner = runner
+        self.listen_url = listen_url
+        self.client_buffer = client_buffer
+        self.poll_secs = poll_secs
+        self.subscribers: Set[Subscriber] = set()
+        self.last_id: Optional[int] = None
+        self._gaps: Dict[int, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop_listening: Optional[threading.Event] = None
+
+    def subscribe(self, tag: Optional[str] = None) -> Subscriber:
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = self._loop.create_task(self._run())
+        sub = Subscriber(tag, self.client_buffer)
+        self.subscribers.add(sub)
+        SUBSCRIBERS.set(len(self.subscribers))
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+        SUBSCRIBERS.set(len(self.subscribers))
+        if not self.subscribers:
+            self._halt()
+
+    def nudge(self) -> None:
+        """Poll now rather than at the next interval; safe to call from any thread."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def stop(self) -> None:
+        task = self._halt()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    def _halt(self) -> Optional[asyncio.Task]:
+        """Stop polling and listening; the next ``subscribe`` starts again from the newest row."""
+        if self._stop_listening is not None:
+            self._stop_listening.set()
+            self._stop_listening = None
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+        return task
+
+    async def _run(self) -> None:
+        # Also on a restart: nobody was subscribed for the rows in between.
+        self._gaps.clear()
+        self.last_id = await self.runner(latest_id)
+        if self.listen_url:
+            self._stop_listening = threading.Event()
+            threading.Thread(
+                target=self._listen, args=(self._stop_listening,), name="task-changes", daemon=True
+            ).start()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_secs)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.poll()
+            except Exception:
+                log.exception("Task change feed poll failed")
+                await asyncio.sleep(self.poll_secs)
+
+    async def poll(self) -> None:
+        """Dispatch rows committed since the last poll (and late rows filling gaps)."""
+        rows = await self.runner(changes_since, self.last_id, set(self._gaps))
+        now = monotonic()
+        for row in rows:
+            change_id = row["id"]
+            if change_id <= self.last_id and self._gaps.pop(change_id, None) is None:
+                continue
+            if change_id > self.last_id:
+                for missing in range(self.last_id + 1, min(change_id, self.last_id + MAX_GAPS)):
+                    self._gaps[missing] = now
+                self.last_id = change_id
+            EVENTS.inc()
+            self._dispatch(row)
+        for change_id, seen in list(self._gaps.items()):
+            if now - seen > GAP_SECS or len(self._gaps) > MAX_GAPS:
+                del self._gaps[change_id]  # rolled back; the id will never appear
+        if len(rows) == BATCH:
+            self._wake.set()
+
+    def _dispatch(self, change: dict) -> None:
+        for sub in list(self.subscribers):
+            if not sub.wants(change):
+                continue
+            try:
+                sub.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                # Cut the slow client off; it resumes from its Last-Event-ID.
+                self.unsubscribe(sub)
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait(None)
+                DISCONNECTS.inc()
+
+    def _listen(self, stop: threading.Event) -> None:
+        """LISTEN on a dedicated Postgres connection; every notification wakes the feed."""
+        engine = create_engine(self.listen_url, poolclass=NullPool)
+        while not stop.is_set():
+            try:
+                conn = engine.raw_connection()
+                try:
+                    driver = conn.driver_connection
+                    driver.autocommit = True
+                    driver.execute(f"LISTEN {CHANNEL}")
+                    self.nudge()  # catch up on anything committed while not listening
+                    while not stop.is_set():
+                        for _ in driver.notifies(timeout=1.0):
+                            self.nudge()
+                finally:
+                    conn.close()
+            except Exception as exc:
+                log.warning("LISTEN %s failed, retrying in 5s: %s", CHANNEL, exc)
+                stop.wait(5)
+        engine.dispose()
+
+
+change_feed = ChangeFeed(listen_url=DATABASE_URL if DATABASE_URL.startswith("postgres") else None)
+
+
+@event.listens_for(_OrmSession, "do_orm_execute")
+def _note_write(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+@event.listens_for(_OrmSession, "after_commit")
+def _nudge_after_commit(session) -> None:
+    if session.info.pop("wrote", False):
+        change_feed.nudge()
+
+
+def _frame(change: dict) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (
+        change["id"],
+        change["op"].encode(),
+        orjson.dumps(change),
+    )
+
+
+async def event_stream(feed: ChangeFeed, tag: Optional[str], after: Optional[int]):
+    sub = feed.subscribe(tag)
+    try:
+        yield b"retry: %d\n\n" % RETRY_MS
+        replayed: Set[int] = set()
+        if after is not None:
+            rows = await feed.runner(backfill, after, tag)
+            if rows is None:
+                yield b"event: reset\ndata: {}\n\n"
+            else:
+                for row in rows:
+                    replayed.add(row["id"])
+                    yield _frame(row)
+        while True:
+            try:
+                change = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_SECS)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if change is None:
+                return
+            if change["id"] in replayed or (after is not None and change["id"] <= after):
+                continue
+            yield _frame(change)
+    finally:
+        feed.unsubscribe(sub)
+
+
+router = APIRouter(prefix="/tasks", tags=["changes"])
+
+
+@router.get(
+    "/changes",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def task_changes(
+    tag: Optional[str] = Query(default=None, description="Only changes to tasks with this tag"),
+    last_event_id: Optional[str] = Header(default=None, description="Resume after this event"),
+):
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(
+        event_stream(change_feed, tag, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,249 @@
+"""Response compression negotiated from ``Accept-Encoding``.
+
+Brotli (when the optional ``brotli`` package is installed) is preferred over
+gzip at equal quality values. A response is left alone when it:
+
+- already has a ``Content-Encoding`` (``/metrics``, ``/tasks/export?gzip=true``);
+- has a content type that does not compress well, or is ``text/event-stream``
+  (the change feed), whose events are too small to gain from a flush each;
+- is a single body smaller than ``COMPRESSION_MIN_SIZE`` bytes;
+- has a status without a body (1xx, 204, 304) or is a range response.
+
+A single-message body is compressed in one go. Bodies larger than
+``COMPRESSION_THREADPOOL_ABOVE`` are compressed in the threadpool so a 500-row
+page does not stall the event loop. Streamed responses (export) are compressed
+chunk by chunk, with a sync flush after each chunk so clients receive every
+chunk as it is produced.
+
+A strong ``ETag`` on a compressed response is weakened (``W/``): the encoded
+bytes are not the identity representation it was computed for.
+"""
+
+import os
+import time
+import zlib
+from typing import Optional, Sequence, Tuple
+
+from prometheus_client import Counter, Histogram
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # optional dependency: pip install brotli
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") in ("1", "true", "True")
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "4"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+THREADPOOL_ABOVE = int(os.getenv("COMPRESSION_THREADPOOL_ABOVE", "262144"))
+
+ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = frozenset(
+    (
+        "application/json",
+        "application/x-ndjson",
+        "application/problem+json",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+    )
+)
+NEVER_COMPRESSED_TYPES = frozenset(("text/event-stream",))
+_SKIP_STATUS = frozenset((204, 206, 304))
+
+COMPRESSED = Counter("http_compressed_responses_total", "Responses sent compressed.", ["encoding"])
+SKIPPED = Counter(
+    "http_compression_skipped_total", "Responses sent without compression.", ["reason"]
+)
+BYTES_IN = Counter(
+    "http_compression_bytes_in_total", "Response bytes before compression.", ["encoding"]
+)
+BYTES_OUT = Counter(
+    "http_compression_bytes_out_total", "Response bytes after compression.", ["encoding"]
+)
+RATIO = Histogram(
+    "http_compression_ratio",
+    "Compressed size divided by original size, per response.",
+    ["encoding"],
+    buckets=(0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.7, 0.9, 1.0),
+)
+CPU_SECONDS = Histogram(
+    "http_compression_cpu_seconds",
+    "CPU time spent compressing one response.",
+    ["encoding"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+
+def negotiate(accept_encoding: str, available: Sequence[str] = ENCODINGS) -> Optional[str]:
+    """Best of ``available`` for an ``Accept-Encoding`` value; ties go to the earlier one."""
+    prefs = {}
+    for item in accept_encoding.split(","):
+        name, *params = (p.strip() for p in item.split(";"))
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            prefs[name.lower()] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = prefs.get(encoding, prefs.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in NEVER_COMPRESSED_TYPES:
+        return False
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith("+json")
+    )
+
+
+class Encoder:
+    """Incremental compressor that tracks its input, output and CPU time."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        start = time.thread_time()
+        if self.encoding == "br":
+            out = self._c.process(data) + (self._c.finish() if final else self._c.flush())
+        else:
+            out = self._c.compress(data) + self._c.flush(
+                zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+            )
+        self.cpu_seconds += time.thread_time() - start
+        self.bytes_in += len(data)
+        self.bytes_out += len(out)
+        return out
+
+    def record(self) -> None:
+        COMPRESSED.labels(self.encoding).inc()
+        BYTES_IN.labels(self.encoding).inc(self.bytes_in)
+        BYTES_OUT.labels(self.encoding).inc(self.bytes_out)
+        if self.bytes_in:
+            RATIO.labels(self.encoding).observe(self.bytes_out / self.bytes_in)
+        CPU_SECONDS.labels(self.encoding).observe(self.cpu_seconds)
+
+
+def _skip_reason(start: Message, headers: Headers, body: bytes, more_body: bool) -> Optional[str]:
+    status = start["status"]
+    if status < 200 or status in _SKIP_STATUS or "content-range" in headers:
+        return "status"
+    if "content-encoding" in headers:
+        return "encoded"
+    if not compressible(headers.get("content-type", "")):
+        return "type"
+    length = headers.get("content-length")
+    if not more_body and len(body) < MIN_SIZE:
+        return "small"
+    if more_body and length is not None and length.isdigit() and int(length) < MIN_SIZE:
+        return "small"
+    return None
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    etag = headers.get("etag")
+    if etag is not None and not etag.startswith("W/"):
+        headers["etag"] = "W/" + etag
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, encodings: Sequence[str] = ENCODINGS):
+        self.app = app
+        self.encodings = tuple(encodings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        start: Optional[Message] = None
+        encoder: Optional[Encoder] = None
+        passthrough = False
+
+        async def _send(message: Message):
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows how big the body is.
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(scope=start)
+                reason = _skip_reason(start, headers, body, more_body)
+                if reason is None:
+                    # The representation now depends on Accept-Encoding, whichever one we send.
+                    headers.add_vary_header("Accept-Encoding")
+                if reason is None and encoding is None:
+                    reason = "not_accepted"
+                if reason is not None:
+                    SKIPPED.labels(reason).inc()
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = Encoder(encoding)
+                if not more_body:
+                    await self._send_whole(send, start, headers, encoder, body)
+                    return
+                del headers["content-length"]
+                headers["content-encoding"] = encoding
+                _weaken_etag(headers)
+                await send(start)
+
+            chunk = await self._compress(encoder, body, final=not more_body)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            if not more_body:
+                encoder.record()
+
+        await self.app(scope, receive, _send)
+
+    async def _send_whole(self, send: Send, start, headers, encoder: Encoder, body: bytes):
+        compressed = await self._compress(encoder, body, final=True)
+        if len(compressed) >= len(body):
+            SKIPPED.labels("no_gain").inc()
+        else:
+            headers["content-encoding"] = encoder.encoding
+            headers["content-length"] = str(len(compressed))
+            _weaken_etag(headers)
+            encoder.record()
+            body = compressed
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _compress(encoder: Encoder, data: bytes, final: bool) -> bytes:
+        if len(data) > THREADPOOL_ABOVE:
+            return await run_in_threadpool(encoder.compress, data, final)
+        return encoder.compress(data, final)
@@ -0,0 +1,103 @@
+"""ETag / Last-Modified helpers for conditional task requests (RFC 9110 §13)."""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Sequence, Tuple
+
+from starlette.requests import Request
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _stamp(updated_at) -> int:
+    """``updated_at`` as microseconds since the epoch (naive values are UTC)."""
+    dt = as_datetime(updated_at)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // timedelta(microseconds=1)
+
+
+def task_etag(task_id: int, version: int, updated_at) -> str:
+    # (id, version) alone is not unique per row: SQLite hands the highest id out again
+    # after that row is deleted, and the new row starts at version 1 too.
+    return f'"t{task_id}.{version}.{_stamp(updated_at):x}"'
+
+
+def list_etag(
+    versions: Iterable[Tuple[int, int, datetime]],
+    total: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> str:
+    """Strong ETag for a page, derived from its ``(id, version, updated_at)`` rows.
+
+    The total (if sent) and the sparse fieldset are hashed in too, since they change
+    the representation without changing any version.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for task_id, version, updated_at in versions:
+        h.update(b"%d:%d:%d," % (task_id, version, _stamp(updated_at)))
+    if total is not None:
+        h.update(b"total:%d" % total)
+    if fields:
+        h.update(("fields:" + ",".join(fields)).encode())
+    return f'"l{h.hexdigest()}"'
+
+
+def as_datetime(value) -> datetime:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def http_date(dt: datetime) -> str:
+    return format_datetime(dt.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _etags(header: str) -> list:
+    return [t.strip().removeprefix("W/") for t in header.split(",")]
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """If-None-Match wins over If-Modified-Since when both are sent."""
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return inm.strip() == "*" or etag in _etags(inm)
+    ims = request.headers.get("if-modified-since")
+    if ims is not None and last_modified is not None:
+        since = _parse_http_date(ims)
+        return since is not None and last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def has_conditions(request: Request) -> bool:
+    headers = request.headers
+    return "if-none-match" in headers or "if-modified-since" in headers
+
+
+def if_match_version(request: Request, task_id: int) -> Optional[Tuple[int, datetime]]:
+    """``(version, updated_at)`` required by ``If-Match``; ``None`` when absent or ``*``.
+
+    A header naming no usable tag for this task yields a pair no row can match. Our
+    tags are accepted with a ``W/`` prefix too: compression weakens them, but they
+    still name one exact version.
+    """
+    header = request.headers.get("if-match")
+    if header is None or header.strip() == "*":
+        return None
+    prefix = f'"t{task_id}.'
+    for tag in _etags(header):
+        if not (tag.startswith(prefix) and tag.endswith('"')):
+            continue
+        version, _, stamp = tag[len(prefix) : -1].partition(".")
+        try:
+            return int(version), _EPOCH + timedelta(microseconds=int(stamp, 16))
+        except (ValueError, OverflowError):
+            continue
+    return -1, _EPOCH
@@ -0,0 +1,121 @@
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.observability.db_timing import instrument_pool
+from app.sqlite import BUSY_TIMEOUT_MS, RoutingSession, apply_pragmas, is_file_url, writer_for
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./dev.db")
+DB_ASYNC = os.getenv("DB_ASYNC", "0") in ("1", "true", "True")
+
+
+def engine_kwargs(url: str) -> dict:
+    if url.startswith("sqlite"):
+        kwargs = {"echo": False, "connect_args": {"check_same_thread": False}}
+        if is_file_url(url):
+            # Pooled readers; WAL lets them run alongside the writer (app/sqlite.py).
+            kwargs["connect_args"]["timeout"] = BUSY_TIMEOUT_MS / 1000
+            kwargs["pool_size"] = int(os.getenv("DB_POOL_SIZE", "5"))
+            kwargs["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        return kwargs
+    return {
+        "echo": False,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+
+def async_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (aiosqlite / psycopg async)."""
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")
+    elif u.get_backend_name() == "postgresql":
+        # psycopg3 ships both drivers; create_async_engine picks the async one.
+        u = u.set(drivername="postgresql+psycopg")
+    return u.render_as_string(hide_password=False)
+
+
+engine = create_engine(DATABASE_URL, **engine_kwargs(DATABASE_URL))
+async_engine = (
+    create_async_engine(async_url(DATABASE_URL), **engine_kwargs(DATABASE_URL))
+    if DB_ASYNC
+    else None
+)
+# SQLite file mode: every statement that writes goes through this one connection.
+write_engine = writer_for(DATABASE_URL, engine_kwargs(DATABASE_URL))
+instrument_pool(engine)
+if async_engine is not None:
+    instrument_pool(async_engine.sync_engine, "primary-async")
+if is_file_url(DATABASE_URL):
+    apply_pragmas(engine)
+    if async_engine is not None:
+        apply_pragmas(async_engine.sync_engine)
+if write_engine is not None:
+    instrument_pool(write_engine, "writer")
+
+
+def _new_sync_session() -> Session:
+    return Session(engine) if write_engine is None else RoutingSession(engine, write_engine)
+
+
+def _get_sync_session():
+    with _new_sync_session() as session:
+        yield session
+
+
+async def _get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+get_session = _get_async_session if DB_ASYNC else _get_sync_session
+
+
+async def run_db(session, fn, *args, **kwargs):
+    """Run ``fn(sync_session, *args)`` without blocking the event loop.
+
+    AsyncSession runs it on a greenlet against the async driver; a plain Session
+    falls back to the threadpool, which is what sync handlers used to do.
+    """
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, session, *args, **kwargs)
+
+
+async def run_in_session(fn, *args, **kwargs):
+    """``run_db`` on a session of its own, for database work not tied to one request."""
+    if DB_ASYNC:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            return await session.run_sync(fn, *args, **kwargs)
+
+    def _call():
+        with _new_sync_session() as session:
+            return fn(session, *args, **kwargs)
+
+    return await run_in_threadpool(_call)
+
+
+async def run_on(bind, fn, *args, **kwargs):
+    """``run_db`` on a short-lived session of its own against ``bind`` (an engine).
+
+    For work shared by several requests (app/singleflight.py), which must not run on
+    any one request's session: that session closes when its request ends.
+    """
+    if isinstance(bind, AsyncEngine):
+        async with AsyncSession(bind, expire_on_commit=False) as session:
+            return await session.run_sync(fn, *args, **kwargs)
+
+    def _call():
+        with Session(bind) as session:
+            return fn(session, *args, **kwargs)
+
+    return await run_in_threadpool(_call)
@@ -0,0 +1,103 @@
+"""GET /tasks/export: stream the task table as NDJSON or CSV.
+
+Rows are pulled in ``EXPORT_BATCH_SIZE`` partitions from a server-side cursor
+(``yield_per``) and each partition is encoded into one chunk, so memory stays
+flat however large the table is. The query runs before the response starts, so
+a failed replica can still be retried on the primary (``primary_fallback``).
+"""
+
+import csv
+import io
+import json
+import os
+import zlib
+from typing import AsyncIterator, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app import crud
+from app.replicas import get_read_session, primary_fallback
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+router = APIRouter(prefix="/tasks", tags=["export"])
+
+
+async def _execute(session, stmt):
+    """Run the export query; its rows are then read partition by partition."""
+    if isinstance(session, AsyncSession):
+        return (await session.stream(stmt)).mappings().partitions()
+    return (await run_in_threadpool(session.exec, stmt)).mappings().partitions()
+
+
+async def _partitions(parts) -> AsyncIterator[List[dict]]:
+    if hasattr(parts, "__anext__"):
+        async for part in parts:
+            yield part
+        return
+    while True:
+        part = await run_in_threadpool(next, parts, None)
+        if part is None:
+            return
+        yield part
+
+
+def _plain(row) -> dict:
+    out = dict(row)
+    out["updated_at"] = out["updated_at"].isoformat()
+    return out
+
+
+def _ndjson(rows: List[dict]) -> bytes:
+    return "".join(json.dumps(_plain(r), ensure_ascii=False) + "\n" for r in rows).encode()
+
+
+def _csv(rows: List[dict]) -> bytes:
+    buf = io.StringIO()
+    csv.DictWriter(buf, fieldnames=crud.FIELDS, lineterminator="\n").writerows(map(_plain, rows))
+    return buf.getvalue().encode()
+
+
+async def _encode(parts, fmt: str, gzip: bool) -> AsyncIterator[bytes]:
+    encode = _csv if fmt == "csv" else _ndjson
+    z = zlib.compressobj(wbits=31) if gzip else None
+    if fmt == "csv":
+        header = (",".join(crud.FIELDS) + "\n").encode()
+        yield z.compress(header) if z else header
+    async for part in _partitions(parts):
+        chunk = encode(part)
+        if z:
+            chunk = z.compress(chunk)
+        if chunk:
+            yield chunk
+    if z:
+        yield z.flush()
+
+
+@router.get("/export", response_class=StreamingResponse)
+@primary_fallback
+async def export_tasks(
+    format: Literal["ndjson", "csv"] = Query(default="ndjson"),
+    search: Optional[str] = Query(default=None, description="Search in title/description/tag"),
+    tag: Optional[str] = Query(default=None),
+    completed: Optional[bool] = Query(default=None),
+    gzip: bool = Query(default=False, description="Send the body with Content-Encoding: gzip"),
+    session=Depends(get_read_session),
+):
+    stmt = crud.export_statement(
+        crud.dialect_of(session),
+        search=search,
+        tag=tag,
+        completed=completed,
+        batch_size=EXPORT_BATCH_SIZE,
+    )
+    parts = await _execute(session, stmt)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="tasks.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(_encode(parts, format, gzip), media_type=media_type, headers=headers)
@@ -0,0 +1,140 @@
+"""Group commit for single-task creates and completes (opt-in, ``GROUP_COMMIT=1``).
+
+Each POST /tasks/ and PATCH /tasks/{id}/complete normally runs its own
+transaction, so under bursty load write throughput is capped by commit (fsync)
+latency. With group commit, writes that arrive within
+``GROUP_COMMIT_MAX_WAIT_MS`` of the first pending one are queued. The queue is
+flushed when that wait expires or it holds ``GROUP_COMMIT_MAX_BATCH`` writes.
+A flush runs one multi-row INSERT and one UPDATE ... WHERE id IN (...) under
+a single COMMIT (``crud.apply_write_batch``). Each caller then gets its own
+row: ``None`` for a complete whose task does not exist.
+
+If the batch fails, it is rolled back and replayed one write per transaction.
+So a bad write fails alone, and its caller gets its own exception. Completes
+of the same id within one batch share one UPDATE: both callers get the row,
+but its version goes up once.
+
+Batches use their own session (``app.db.run_in_session``), not the request's.
+Tune the settings with ``group_commit_batch_size`` and
+``group_commit_wait_seconds``.
+"""
+
+import asyncio
+import logging
+import os
+from time import perf_counter
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from app import crud
+from app.db import run_in_session
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "0") in ("1", "true", "True")
+MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+MAX_WAIT_MS = float(os.getenv("GROUP_COMMIT_MAX_WAIT_MS", "2"))
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = Histogram(
+    "group_commit_batch_size",
+    "Writes committed together in one group-commit transaction.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+WAIT_SECONDS = Histogram(
+    "group_commit_wait_seconds",
+    "Time a write waited in the queue before its batch started.",
+    buckets=(0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+FALLBACKS = Counter("group_commit_fallbacks_total", "Batches replayed one write per transaction.")
+
+Op = Tuple[str, Any]  # ("create", data) | ("complete", task_id)
+
+
+def apply_ops(session, ops: List[Op]) -> List[Any]:
+    """Results per op, in order; an op that failed on replay gets its exception."""
+    creates = [payload for kind, payload in ops if kind == "create"]
+    completes = [payload for kind, payload in ops if kind == "complete"]
+    try:
+        created, completed = crud.apply_write_batch(session, creates, completes)
+    except Exception:
+        session.rollback()
+        if len(ops) == 1:
+            raise
+        FALLBACKS.inc()
+        log.warning("Group commit of %d writes failed; replaying them one by one", len(ops))
+        return [_apply_one(session, op) for op in ops]
+    created_iter = iter(created)
+    return [next(created_iter) if kind == "create" else completed.get(p) for kind, p in ops]
+
+
+def _apply_one(session, op: Op):
+    kind, payload = op
+    try:
+        if kind == "create":
+            return crud.create_task(session, payload)
+        return crud.complete_task(session, payload)
+    except Exception as exc:
+        session.rollback()
+        return exc
+
+
+class WriteCoalescer:
+    def __init__(
+        self,
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: float = MAX_WAIT_MS,
+        runner: Callable[..., Awaitable] = run_in_session,
+    ):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.runner = runner
+        self._pending: List[Tuple[Op, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: set = set()
+
+    async def create(self, data: dict) -> dict:
+        return await self._submit(("create", data))
+
+    async def complete(self, task_id: int) -> Optional[dict]:
+        return await self._submit(("complete", task_id))
+
+    async def _submit(self, op: Op):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((op, future, perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, batch) -> None:
+        started = perf_counter()
+        BATCH_SIZE.observe(len(batch))
+        for _, _, queued in batch:
+            WAIT_SECONDS.observe(started - queued)
+        try:
+            results = await self.runner(apply_ops, [op for op, _, _ in batch])
+        except Exception as exc:
+            results = [exc] * len(batch)
+        for (_, future, _), result in zip(batch, results):
+            if future.done():  # the caller went away (cancelled request)
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+write_coalescer: Optional[WriteCoalescer] = WriteCoalescer() if GROUP_COMMIT else None
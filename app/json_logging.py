@@ -1,7 +1,55 @@
-import json
+"""Logging setup.
+
+``LOG_MODE=sync`` (default) writes every record twice, plain and JSON, from the
+calling thread. ``LOG_MODE=queue`` only enqueues on the calling thread: a
+background thread formats each record once (``LOG_FORMAT=json|plain``) and
+writes batches of up to ``LOG_BATCH_SIZE`` lines per ``write``. The queue is
+bounded by ``LOG_QUEUE_SIZE``; when it is full records are dropped instead of
+blocking the event loop. Once the queue is ``LOG_SAMPLE_QUEUE_FRACTION`` full,
+only ``LOG_SAMPLE_RATE`` of successful (< 400) access-log records are kept.
+Both kinds of loss are counted in ``log_records_dropped_total{reason}``.
+"""
+
+import atexit
 import logging
 import os
-from typing import Any, Dict
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler
+from typing import Any, Dict, Optional
+
+import orjson
+from prometheus_client import Counter
+
+LOG_MODE = os.getenv("LOG_MODE", "sync")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "256"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SAMPLE_QUEUE_FRACTION = float(os.getenv("LOG_SAMPLE_QUEUE_FRACTION", "0.5"))
+
+PLAIN_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+LOG_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records discarded by the queue logging pipeline.",
+    ["reason"],
+)
+
+_EXTRA_FIELDS = (
+    "request_id",
+    "path",
+    "method",
+    "status_code",
+    "duration_ms",
+    "user_agent",
+    "db_queries",
+    "db_ms",
+    "db_checkout_ms",
+    "n_plus_one",
+)
 
 
 class JsonFormatter(logging.Formatter):
@@ -12,10 +60,125 @@ class JsonFormatter(logging.Formatter):
             "message": record.getMessage(),
             "time": self.formatTime(record, datefmt="%Y-%m-%dT%H:%M:%S%z"),
         }
-        for k in ("path", "method", "status_code", "duration_ms"):
+        for k in _EXTRA_FIELDS:
             if hasattr(record, k):
                 payload[k] = getattr(record, k)
-        return json.dumps(payload, ensure_ascii=False)
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload, default=str).decode()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueue without blocking; drop (and count) when the queue is full."""
+
+    def __init__(
+        self,
+        q: queue.Queue,
+        sample_rate: float = 1.0,
+        sample_fraction: float = 0.5,
+        rand=random.random,
+    ):
+        super().__init__(q)
+        self.sample_rate = sample_rate
+        self.sample_above = int(q.maxsize * sample_fraction) if q.maxsize > 0 else 0
+        self.rand = rand
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener lives in this process, so the record needs no pickling-safe
+        # rewrite; only freeze the message so later changes to args cannot leak in.
+        # Formatting itself happens on the listener thread.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self._sampled_out(record):
+            LOG_DROPPED.labels("sampled").inc()
+            return
+        try:
+            self.enqueue(self.prepare(record))
+        except queue.Full:
+            LOG_DROPPED.labels("queue_full").inc()
+        except Exception:
+            self.handleError(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put_nowait(record)
+
+    def _sampled_out(self, record: logging.LogRecord) -> bool:
+        if self.sample_rate >= 1.0 or getattr(record, "status_code", 500) >= 400:
+            return False
+        if self.queue.qsize() < self.sample_above:
+            return False
+        return self.rand() >= self.sample_rate
+
+
+class BatchingListener:
+    """Background thread that drains the queue and writes formatted lines in batches."""
+
+    _STOP = object()
+
+    def __init__(self, q: queue.Queue, formatter: logging.Formatter, stream=None, batch_size=256):
+        self.queue = q
+        self.formatter = formatter
+        self.stream = stream if stream is not None else sys.stderr
+        self.batch_size = batch_size
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush everything queued so far and stop the thread."""
+        if self._thread is None:
+            return
+        # Blocking put: the sentinel must not be lost to a full queue.
+        self.queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(r is self._STOP for r in batch)
+            self._write([r for r in batch if r is not self._STOP])
+            if stop:
+                return
+
+    def _write(self, records) -> None:
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                LOG_DROPPED.labels("format_error").inc()
+        if not lines:
+            return
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception:
+            LOG_DROPPED.labels("write_error").inc(len(lines))
+
+
+_listener: Optional[BatchingListener] = None
+
+
+def setup_logging() -> None:
+    """Configure the root logger according to ``LOG_MODE``."""
+    if LOG_MODE == "queue":
+        setup_queue_logging()
+    elif LOG_MODE == "sync":
+        setup_dual_logging()
+    else:
+        raise ValueError(f"Unknown LOG_MODE: {LOG_MODE!r}")
 
 
 def setup_dual_logging():
@@ -23,9 +186,7 @@ def setup_dual_logging():
     level = os.getenv("LOG_LEVEL", "INFO").upper()
 
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(
-        logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
-    )
+    console_handler.setFormatter(logging.Formatter(PLAIN_FORMAT))
 
     json_handler = logging.StreamHandler()
     json_handler.setFormatter(JsonFormatter())
@@ -36,3 +197,48 @@ def setup_dual_logging():
 
     root.addHandler(console_handler)
     root.addHandler(json_handler)
+
+
+def setup_queue_logging(stream=None) -> BatchingListener:
+    """Route the root logger through a bounded queue to a batching writer thread."""
+    global _listener
+    stop_queue_logging()
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(PLAIN_FORMAT)
+
+    q: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = BatchingListener(q, formatter, stream=stream, batch_size=LOG_BATCH_SIZE)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers = []
+    root.setLevel(level)
+    root.addHandler(
+        DroppingQueueHandler(
+            q, sample_rate=LOG_SAMPLE_RATE, sample_fraction=LOG_SAMPLE_QUEUE_FRACTION
+        )
+    )
+    return _listener
+
+
+def stop_queue_logging() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def restart_after_fork() -> None:
+    """Give a forked worker its own queue and writer thread (gunicorn ``post_fork``).
+
+    Threads do not survive ``fork``, and the parent's queue may have been copied
+    mid-operation, so the inherited listener is dropped rather than stopped.
+    """
+    global _listener
+    if _listener is None:
+        return
+    stream, _listener = _listener.stream, None
+    setup_queue_logging(stream=stream)
+
+
+atexit.register(stop_queue_logging)
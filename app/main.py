@@ -1,89 +1,59 @@
 from __future__ import annotations
 
-import contextvars
+import asyncio
 import logging
 import os
-import uuid
 from contextlib import asynccontextmanager
 from typing import List, Optional
 
-from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 from prometheus_fastapi_instrumentator.metrics import default, latency
 from prometheus_fastapi_instrumentator.metrics import requests as reqs_inprogress
-from pydantic import BaseModel, Field
-from sqlmodel import Session, create_engine, select
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
 
-from app.json_logging import setup_dual_logging
-from app.middleware_limits import MaxBodySizeMiddleware, SimpleRateLimitMiddleware
+from app import bulk, changes, crud, export, group_commit, stats
+from app.admission import ADMISSION_ENABLED, AdmissionMiddleware
+from app.cache import task_cache
+from app.compression import CompressionMiddleware
+from app.conditional import (
+    as_datetime,
+    has_conditions,
+    http_date,
+    if_match_version,
+    is_not_modified,
+    list_etag,
+    task_etag,
+)
+from app.db import async_engine, get_session, run_db, run_on
+from app.json_logging import setup_logging
+from app.middleware_limits import MaxBodySizeMiddleware, RateLimitMiddleware
 from app.middleware_security import security_middlewares
 from app.migrate_on_startup import run_migrations_if_enabled
-from app.models import Task
-
-setup_dual_logging()
+from app.observability.db_timing import DBTimingMiddleware
+from app.observability.request_id import RequestIDMiddleware, get_request_id  # noqa: F401
+from app.pagination import decode_cursor, encode_cursor
+from app.replicas import ReadAfterWriteMiddleware, get_read_session, primary_fallback, replica_pool
+from app.schemas import TaskIn, TaskOut
+from app.singleflight import read_flights
+
+setup_logging()
 logger = logging.getLogger("app")
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./dev.db")
-
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
-else:
-    POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
-    MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
-    POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
-    engine = create_engine(
-        DATABASE_URL,
-        echo=False,
-        pool_size=POOL_SIZE,
-        max_overflow=MAX_OVERFLOW,
-        pool_recycle=POOL_RECYCLE,
-        pool_pre_ping=True,
-    )
-
-
-def get_session():
-    with Session(engine) as session:
-        yield session
-
-
-class TaskIn(BaseModel):
-    title: str = Field(..., min_length=1, max_length=200)
-    description: Optional[str] = Field(default=None, max_length=2000)
-    tag: Optional[str] = Field(default=None, max_length=50)
-
-
-class TaskOut(TaskIn):
-    id: int
-    completed: bool
-
-
-_request_id_ctx = contextvars.ContextVar("request_id", default=None)
-
-
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        rid = request.headers.get("x-request-id") or str(uuid.uuid4())
-        token = _request_id_ctx.set(rid)
-        try:
-            response = await call_next(request)
-        finally:
-            _request_id_ctx.reset(token)
-        response.headers["x-request-id"] = rid
-        return response
-
-
-def get_request_id() -> str:
-    return _request_id_ctx.get() or ""
-
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     run_migrations_if_enabled()
+    monitor = asyncio.create_task(replica_pool.monitor()) if replica_pool else None
+    retention = asyncio.create_task(changes.retention_loop())
     yield
+    retention.cancel()
+    await changes.change_feed.stop()
+    if monitor is not None:
+        monitor.cancel()
+        await replica_pool.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 app = FastAPI(title="FastAPI To-Do (SQLModel + Alembic)", lifespan=lifespan)
@@ -104,51 +74,20 @@ instrumentator.add(latency(buckets=(50, 100, 200, 300, 500, 1000, 2000, 5000)))
 instrumentator.add(reqs_inprogress())
 instrumentator.instrument(app).expose(app, include_in_schema=False, should_gzip=True)
 
-app.add_middleware(RequestIDMiddleware)
+# Outermost last: request id/access log wraps everything, including rejected requests,
+# and DB timing wraps the access log so it can report the request's query stats.
+# Compression is the innermost of these, but the security headers, CORS and the
+# instrumentator (added above) run inside it, so the instrumentator sees uncompressed sizes.
+# Admission control sits inside the cheap rejections (body size, rate limit), so
+# requests they turn away never take a slot.
+app.add_middleware(CompressionMiddleware)
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
 app.add_middleware(MaxBodySizeMiddleware)
-app.add_middleware(SimpleRateLimitMiddleware)
-
-
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    from time import perf_counter
-
-    start = perf_counter()
-    response = await call_next(request)
-    duration_ms = (perf_counter() - start) * 1000
-    logger.info(
-        "request",
-        extra={
-            "request_id": get_request_id(),
-            "path": request.url.path,
-            "method": request.method,
-            "status_code": response.status_code,
-            "duration_ms": round(duration_ms, 2),
-            "user_agent": request.headers.get("user-agent", ""),
-        },
-    )
-    return response
-
-
-@app.middleware("http")
-async def relax_csp_for_docs(request: Request, call_next):
-    resp = await call_next(request)
-    p = request.url.path
-    if p.startswith("/docs"):
-        resp.headers["Content-Security-Policy"] = (
-            "default-src 'none'; "
-            "connect-src 'self'; "
-            "img-src 'self' data:; "
-            "script-src 'self' https://cdn.jsdelivr.net 'unsafe-inline'; "
-            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net"
-        )
-    elif p.startswith("/redoc"):
-        resp.headers["Content-Security-Policy"] = (
-            "default-src 'none'; connect-src 'self'; img-src 'self' data:; "
-            "script-src 'self' https://cdn.jsdelivr.net 'unsafe-inline'; "
-            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net"
-        )
-    return resp
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(ReadAfterWriteMiddleware)
+app.add_middleware(RequestIDMiddleware)
+app.add_middleware(DBTimingMiddleware)
 
 
 @app.get("/health")
@@ -156,80 +95,233 @@ def health_check():
     return {"status": "ok"}
 
 
+app.include_router(bulk.router)
+app.include_router(changes.router)
+app.include_router(export.router)
+app.include_router(stats.router)
+
+
 @app.post("/tasks/", response_model=TaskOut, status_code=201)
-def create_task(body: TaskIn, session: Session = Depends(get_session)):
-    task = Task(**body.model_dump())
-    session.add(task)
-    session.commit()
-    session.refresh(task)
+async def create_task(body: TaskIn, response: Response, session=Depends(get_session)):
+    if group_commit.write_coalescer is not None:
+        task = await group_commit.write_coalescer.create(body.model_dump())
+    else:
+        task = await run_db(session, crud.create_task, body.model_dump())
+    await task_cache.invalidate()
+    _set_task_validators(response, task["id"], task["version"], task["updated_at"])
     return task
 
 
+# Read endpoints return ORJSONResponse directly: rows come from the DB as plain dicts and
+# are encoded in one pass, skipping the per-row TaskOut validation of response_model,
+# which is kept only to document the schema.
 @app.get("/tasks/", response_model=List[TaskOut])
-def list_tasks(
+@primary_fallback
+async def list_tasks(
+    request: Request,
     search: Optional[str] = Query(default=None, description="Search in title/description/tag"),
     tag: Optional[str] = Query(default=None),
     completed: Optional[bool] = Query(default=None),
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=int(os.getenv("DEFAULT_PAGE_SIZE", "50")), ge=1, le=500),
-    session: Session = Depends(get_session),
+    cursor: Optional[str] = Query(
+        default=None,
+        description="Keyset cursor from X-Next-Cursor; pass an empty value to start. "
+        "Takes precedence over page.",
+    ),
+    include_total: bool = Query(
+        default=False,
+        description="Send X-Total-Count with X-Total-Count-Accuracy (exact|estimate) and "
+        "X-Total-Count-Source (stats|window|count|planner|cache).",
+    ),
+    fields: Optional[str] = Query(
+        default=None,
+        description="Comma-separated fields to return, e.g. id,title,completed; "
+        "id is always included.",
+    ),
+    session=Depends(get_read_session),
 ):
-    stmt = select(Task)
-    if tag is not None:
-        stmt = stmt.where(Task.tag == tag)
-    if completed is not None:
-        stmt = stmt.where(Task.completed == completed)
-    if search:
-        s = f"%{search.lower()}%"
-        try:
-            stmt = stmt.where(
-                (Task.title.ilike(s)) | (Task.description.ilike(s)) | (Task.tag.ilike(s))
+    fieldset = _parse_fields(fields)
+    after_id = None
+    if cursor is not None:
+        if search:
+            # Search results are ranked, not id-ordered, so there is no keyset to seek on.
+            raise HTTPException(status_code=400, detail="cursor cannot be combined with search")
+        after_id = decode_cursor(cursor) if cursor else 0
+    filters = {"search": search, "tag": tag, "completed": completed}
+    params = {
+        **filters,
+        "offset": (page - 1) * page_size if after_id is None else 0,
+        "limit": page_size,
+        "after_id": after_id,
+    }
+    # Sparse pages are cached under their own key; full pages keep the old one.
+    cache_params = {**params, "fields": fieldset} if fieldset else params
+    gen = await task_cache.generation()
+    items = await task_cache.get_list(cache_params, gen)
+    total = None
+    if include_total:
+        total = await _cheap_total(session, filters, gen)
+    revalidating = "if-none-match" in request.headers
+    if items is None and revalidating and (total is not None or not include_total):
+        # Answer revalidation from (id, version, updated_at) alone; only load full rows
+        # when the page actually changed.
+        versions = await run_db(session, crud.list_versions, **params)
+        headers = _list_validators(versions, total, fieldset)
+        if is_not_modified(request, headers["ETag"], None):
+            return Response(status_code=304, headers=headers)
+    if items is None:
+        # Identical concurrent misses share one query (see app/singleflight.py), run on
+        # a session of its own against the engine this request would have read from.
+        bind = session.bind
+        key = (bind, gen, tuple(sorted(cache_params.items())))
+        if include_total and total is None:
+            items, total = await read_flights.do(
+                "list_total",
+                key,
+                lambda: run_on(bind, crud.list_tasks_with_total, fieldset, **params),
+            )
+            await task_cache.set_count(filters, gen, [total.count, total.accuracy])
+        else:
+            items = await read_flights.do(
+                "list", key, lambda: run_on(bind, crud.list_tasks, fieldset, **params)
             )
-        except Exception:
-            pass
-    stmt = stmt.offset((page - 1) * page_size).limit(page_size)
-    items = session.exec(stmt).all()
-    return items
+        await task_cache.set_list(cache_params, gen, items)
+    elif include_total and total is None:
+        total = await run_db(session, crud.count_tasks, **filters)
+        await task_cache.set_count(filters, gen, [total.count, total.accuracy])
+    headers = _list_validators(
+        [(t["id"], t["version"], t["updated_at"]) for t in items], total, fieldset
+    )
+    if revalidating and is_not_modified(request, headers["ETag"], None):
+        return Response(status_code=304, headers=headers)
+    if len(items) == page_size and not search:
+        headers["X-Next-Cursor"] = encode_cursor(items[-1]["id"])
+    if fieldset:
+        # version/updated_at were selected for the validators; send only what was asked.
+        items = [{k: t[k] for k in fieldset} for t in items]
+    return ORJSONResponse(items, headers=headers)
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    """``fields=`` as a tuple in column order (always with id); ``None`` for all fields."""
+    names = {f.strip() for f in (fields or "").split(",") if f.strip()}
+    if not names:
+        return None
+    unknown = names.difference(crud.FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}; "
+            f"choose from {', '.join(crud.FIELDS)}",
+        )
+    return tuple(f for f in crud.FIELDS if f in names or f == "id")
+
+
+async def _cheap_total(session, filters: dict, gen: int) -> Optional[crud.Total]:
+    """A total that costs no scan: stats counters or a cached count, else ``None``."""
+    if not filters["search"] and filters["tag"] != "":
+        # task_stats folds '' and NULL tags together, so tag="" has to be counted.
+        return await run_db(
+            session, crud.stats_total, tag=filters["tag"], completed=filters["completed"]
+        )
+    cached = await task_cache.get_count(filters, gen)
+    return crud.Total(cached[0], cached[1], "cache") if cached is not None else None
+
+
+def _list_validators(versions: list, total=None, fields=None) -> dict:
+    """ETag (and total) headers for a page.
+
+    Pages get no Last-Modified: deleting a row leaves the newest ``updated_at`` on the
+    page unchanged, so If-Modified-Since would answer 304 for a page that lost a row.
+    List revalidation is by ETag only.
+    """
+    headers = {"ETag": list_etag(versions, total.count if total else None, fields)}
+    if total is not None:
+        headers["X-Total-Count"] = str(total.count)
+        headers["X-Total-Count-Accuracy"] = total.accuracy
+        headers["X-Total-Count-Source"] = total.source
+    return headers
 
 
 @app.get("/tasks/{task_id}", response_model=TaskOut)
-def get_task(task_id: int, session: Session = Depends(get_session)):
-    task = session.get(Task, task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return task
+@primary_fallback
+async def get_task(task_id: int, request: Request, session=Depends(get_read_session)):
+    data = await task_cache.get_task(task_id)
+    if data is None and has_conditions(request):
+        current = await run_db(session, crud.get_version, task_id)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        if _task_not_modified(request, task_id, *current):
+            return _task_304(task_id, *current)
+    if data is None:
+        gen = await task_cache.generation()
+        bind = session.bind
+        data = await read_flights.do(
+            "task", (bind, gen, task_id), lambda: run_on(bind, crud.get_task, task_id)
+        )
+        if data is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        await task_cache.set_task(task_id, data, gen)
+    version, updated_at = data["version"], as_datetime(data["updated_at"])
+    if _task_not_modified(request, task_id, version, updated_at):
+        return _task_304(task_id, version, updated_at)
+    response = ORJSONResponse(data)
+    _set_task_validators(response, task_id, version, updated_at)
+    return response
+
+
+def _task_not_modified(request: Request, task_id: int, version: int, updated_at) -> bool:
+    return is_not_modified(request, task_etag(task_id, version, updated_at), updated_at)
+
+
+def _task_304(task_id: int, version: int, updated_at) -> Response:
+    response = Response(status_code=304)
+    _set_task_validators(response, task_id, version, updated_at)
+    return response
+
+
+def _set_task_validators(response: Response, task_id: int, version: int, updated_at) -> None:
+    response.headers["ETag"] = task_etag(task_id, version, updated_at)
+    response.headers["Last-Modified"] = http_date(as_datetime(updated_at))
 
 
 @app.put("/tasks/{task_id}", response_model=TaskOut)
-def update_task(task_id: int, body: TaskIn, session: Session = Depends(get_session)):
-    task = session.get(Task, task_id)
+async def update_task(
+    task_id: int,
+    body: TaskIn,
+    request: Request,
+    response: Response,
+    session=Depends(get_session),
+):
+    expected = if_match_version(request, task_id)
+    try:
+        task = await run_db(session, crud.update_task, task_id, body.model_dump(), expected)
+    except crud.VersionConflict:
+        raise HTTPException(status_code=412, detail="Task was modified (ETag mismatch)")
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    for k, v in body.model_dump().items():
-        setattr(task, k, v)
-    session.add(task)
-    session.commit()
-    session.refresh(task)
+    await task_cache.invalidate([task_id])
+    _set_task_validators(response, task_id, task["version"], task["updated_at"])
     return task
 
 
 @app.patch("/tasks/{task_id}/complete", response_model=TaskOut)
-def complete_task(task_id: int, session: Session = Depends(get_session)):
-    task = session.get(Task, task_id)
+async def complete_task(task_id: int, response: Response, session=Depends(get_session)):
+    if group_commit.write_coalescer is not None:
+        task = await group_commit.write_coalescer.complete(task_id)
+    else:
+        task = await run_db(session, crud.complete_task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    task.completed = True
-    session.add(task)
-    session.commit()
-    session.refresh(task)
+    await task_cache.invalidate([task_id])
+    _set_task_validators(response, task_id, task["version"], task["updated_at"])
     return task
 
 
 @app.delete("/tasks/{task_id}", status_code=204)
-def delete_task(task_id: int, session: Session = Depends(get_session)):
-    task = session.get(Task, task_id)
-    if not task:
+async def delete_task(task_id: int, session=Depends(get_session)):
+    if not await run_db(session, crud.delete_task, task_id):
         raise HTTPException(status_code=404, detail="Task not found")
-    session.delete(task)
-    session.commit()
+    await task_cache.invalidate([task_id])
     return None
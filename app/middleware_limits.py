@@ -1,30 +1,61 @@
 import os
-import time
+from typing import Optional
 
-from fastapi import HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.ratelimit import RateLimitStore, build_store
 
 MAX_BYTES = int(os.getenv("MAX_BODY_BYTES", "1048576"))
 WINDOW_SECS = int(os.getenv("RL_WINDOW_SECS", "60"))
 MAX_REQS = int(os.getenv("RL_MAX_REQS", "120"))
 
-_buckets = {}
 
+class MaxBodySizeMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            cl = Headers(scope=scope).get("content-length")
+            if cl and (not cl.isdigit() or int(cl) > MAX_BYTES):
+                status = 413 if cl.isdigit() else 400
+                detail = "Request too large" if status == 413 else "Invalid Content-Length"
+                await JSONResponse({"detail": detail}, status_code=status)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class RateLimitMiddleware:
+    """Per-client request limit (RL_MAX_REQS per RL_WINDOW_SECS) with RateLimit-* headers."""
+
+    def __init__(self, app: ASGIApp, store: Optional[RateLimitStore] = None):
+        self.app = app
+        self.store = store or build_store()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class MaxBodySizeMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        cl = request.headers.get("content-length")
-        if cl and int(cl) > MAX_BYTES:
-            raise HTTPException(status_code=413, detail="Request too large")
-        return await call_next(request)
+        client = scope.get("client")
+        result = await self.store.hit(client[0] if client else "unknown", MAX_REQS, WINDOW_SECS)
+        headers = [
+            (b"ratelimit-limit", str(result.limit).encode()),
+            (b"ratelimit-remaining", str(result.remaining).encode()),
+            (b"ratelimit-reset", str(result.reset).encode()),
+        ]
+        if not result.allowed:
+            response = JSONResponse({"detail": "Too Many Requests"}, status_code=429)
+            response.raw_headers.extend(headers)
+            response.raw_headers.append((b"retry-after", str(result.retry_after).encode()))
+            await response(scope, receive, send)
+            return
 
+        async def _send(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *headers]
+            await send(message)
 
-class SimpleRateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        now = int(time.time())
-        key = (request.client.host or "unknown", now // WINDOW_SECS)
-        _buckets[key] = _buckets.get(key, 0) + 1
-        if _buckets[key] > MAX_REQS:
-            raise HTTPException(status_code=429, detail="Too Many Requests")
-        return await call_next(request)
+        await self.app(scope, receive, _send)
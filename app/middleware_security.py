@@ -2,33 +2,48 @@ from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
 from starlette.types import ASGIApp, Receive, Scope, Send
 
+DEFAULT_CSP = (
+    b"default-src 'none'; connect-src 'self'; img-src 'self' data:; script-src 'self'; "
+    b"style-src 'self' 'unsafe-inline'"
+)
+# Swagger UI / ReDoc load their bundles from jsDelivr and use inline bootstrapping.
+DOCS_CSP = (
+    b"default-src 'none'; connect-src 'self'; img-src 'self' data:; "
+    b"script-src 'self' https://cdn.jsdelivr.net 'unsafe-inline'; "
+    b"style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net"
+)
+DOCS_PREFIXES = ("/docs", "/redoc")
+
+_STATIC_HEADERS = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"referrer-policy", b"no-referrer"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+    (b"strict-transport-security", b"max-age=63072000; includeSubDomains; preload"),
+    (b"cross-origin-opener-policy", b"same-origin"),
+    (b"cross-origin-resource-policy", b"same-site"),
+    (b"cross-origin-embedder-policy", b"require-corp"),
+)
+
 
 class SecurityHeadersMiddleware:
     def __init__(self, app: ASGIApp):
         self.app = app
+        self._default = _STATIC_HEADERS + ((b"content-security-policy", DEFAULT_CSP),)
+        self._docs = _STATIC_HEADERS + ((b"content-security-policy", DOCS_CSP),)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        add = self._docs if scope["path"].startswith(DOCS_PREFIXES) else self._default
+
         async def _send(msg):
-            if msg.get("type") == "http.response.start":
-                add = [
-                    (b"x-content-type-options", b"nosniff"),
-                    (b"x-frame-options", b"DENY"),
-                    (b"referrer-policy", b"no-referrer"),
-                    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
-                    (b"strict-transport-security", b"max-age=63072000; includeSubDomains; preload"),
-                    (b"cross-origin-opener-policy", b"same-origin"),
-                    (b"cross-origin-resource-policy", b"same-site"),
-                    (b"cross-origin-embedder-policy", b"require-corp"),
-                    (
-                        b"content-security-policy",
-                        b"default-src 'none'; connect-src 'self'; img-src 'self' data:; script-src 'self'; style-src 'self' 'unsafe-inline'",
-                    ),
-                ]
-                base = msg.get("headers", [])
+            if msg["type"] == "http.response.start":
+                base = list(msg.get("headers", []))
                 exists = {k for k, _ in base}
-                for k, v in add:
-                    if k not in exists:
-                        base.append((k, v))
+                base.extend(h for h in add if h[0] not in exists)
                 msg["headers"] = base
             await send(msg)
 
@@ -44,6 +59,18 @@ def security_middlewares():
         allow_origins=origins if origins else [],
         allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         allow_headers=["*"],
+        expose_headers=[
+            "X-Next-Cursor",
+            "ETag",
+            "Retry-After",
+            "RateLimit-Limit",
+            "RateLimit-Remaining",
+            "RateLimit-Reset",
+            "Server-Timing",
+            "X-Total-Count",
+            "X-Total-Count-Accuracy",
+            "X-Total-Count-Source",
+        ],
         allow_credentials=False,
         max_age=600,
     )
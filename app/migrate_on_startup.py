@@ -1,23 +1,44 @@
+"""Apply Alembic migrations when the app starts.
+
+Every worker used to import Alembic, take the advisory lock and run ``upgrade``
+even when there was nothing to do. Now a worker first compares the database's
+revision (one ``SELECT`` on ``alembic_version``) with the head revision of
+``alembic/versions``. The head is read from the revision files' source, without
+importing Alembic. Only when the database is behind does it import Alembic, take
+the lock and upgrade. The lock is Postgres only.
+
+The result is cached per process. With ``gunicorn --preload`` the master runs the
+check once (see gunicorn.conf.py) and forked workers skip it.
+
+``RUN_MIGRATIONS``: ``1`` upgrades, ``check`` fails startup if the database is
+behind, ``0`` skips both.
+"""
+
+import ast
 import logging
 import os
 from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Set
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
-
-from alembic import command
-from alembic.config import Config
+from sqlalchemy.exc import DBAPIError
 
 log = logging.getLogger(__name__)
 LOCK_KEY = 777_777_777
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+VERSIONS_DIR = PROJECT_ROOT / "alembic" / "versions"
 
-
-def _engine() -> Engine:
-    return create_engine(os.environ["DATABASE_URL"], pool_pre_ping=True)
+_at_head = False
 
 
 @contextmanager
 def advisory_lock(engine: Engine):
+    if engine.dialect.name != "postgresql":
+        yield
+        return
     with engine.begin() as conn:
         conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": LOCK_KEY})
     try:
@@ -27,16 +48,76 @@ def advisory_lock(engine: Engine):
             conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_KEY})
 
 
-def run_migrations_if_enabled():
-    if os.getenv("RUN_MIGRATIONS", "1") not in ("1", "true", "True"):
+@lru_cache(maxsize=None)
+def head_revisions(versions_dir: Path = VERSIONS_DIR) -> frozenset:
+    """Revisions that no other revision file names as its ``down_revision``."""
+    revisions: Set[str] = set()
+    parents: Set[str] = set()
+    for path in versions_dir.glob("*.py"):
+        values = {}
+        for node in ast.parse(path.read_text()).body:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1:
+                name = getattr(node.targets[0], "id", None)
+                if name in ("revision", "down_revision"):
+                    values[name] = ast.literal_eval(node.value)
+        if "revision" not in values:
+            continue
+        revisions.add(values["revision"])
+        down = values.get("down_revision")
+        parents.update(down if isinstance(down, (tuple, list)) else [down] if down else [])
+    return frozenset(revisions - parents)
+
+
+def current_revisions(engine: Engine) -> Optional[frozenset]:
+    """Revisions stamped in ``alembic_version``; ``None`` if the table does not exist."""
+    try:
+        with engine.connect() as conn:
+            return frozenset(
+                conn.execute(text("SELECT version_num FROM alembic_version")).scalars()
+            )
+    except DBAPIError:
+        return None
+
+
+def _upgrade(engine: Engine) -> None:
+    from argparse import Namespace
+
+    from alembic import command
+    from alembic.config import Config
+
+    url = engine.url.render_as_string(hide_password=False)
+    # -x DB_URL wins over DATABASE_URL in env.py, so the upgrade targets ``engine``.
+    cfg = Config(str(PROJECT_ROOT / "alembic.ini"), cmd_opts=Namespace(x=[f"DB_URL={url}"]))
+    cfg.set_main_option("script_location", str(PROJECT_ROOT / "alembic"))
+    # alembic.ini's logging config would replace the app's handlers and disable its loggers.
+    cfg.attributes["configure_logger"] = False
+    with advisory_lock(engine):
+        command.upgrade(cfg, "head")
+
+
+def run_migrations_if_enabled(engine: Optional[Engine] = None) -> None:
+    global _at_head
+    mode = os.getenv("RUN_MIGRATIONS", "1")
+    if mode not in ("1", "true", "True", "check"):
         log.info("RUN_MIGRATIONS disabled; skipping Alembic.")
         return
+    if _at_head:
+        return
+    if engine is None:
+        from app.db import engine
 
-    db_url = os.environ["DATABASE_URL"]
-    cfg = Config("alembic.ini")
-    cfg.set_main_option("sqlalchemy.url", db_url)
+    current, head = current_revisions(engine), head_revisions()
+    if current == head:
+        log.info("Database is at head %s; skipping migrations.", ", ".join(sorted(head)))
+        _at_head = True
+        return
+    if mode == "check":
+        raise RuntimeError(
+            f"Database revision {sorted(current or [])} is not at head {sorted(head)}; "
+            "run `alembic upgrade head`."
+        )
 
     log.info("Running Alembic migrations…")
-    with advisory_lock(_engine()):
-        command.upgrade(cfg, "head")
+    _upgrade(engine)
     log.info("Migrations complete.")
+    _at_head = True
@@ -1,11 +1,67 @@
+from datetime import datetime, timezone
 from typing import Optional
 
+from sqlalchemy import BigInteger, Index, Integer, literal_column, text
 from sqlmodel import Field, SQLModel
 
 
+def utcnow() -> datetime:
+    """Naive UTC, matching the timezone-less ``updated_at`` column."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Task(SQLModel, table=True):
+    # Created by migrations 3aa1b4305414 and 3f599fef38f7.
+    __table_args__ = (
+        Index("ix_task_completed_tag", "completed", "tag"),
+        Index("ix_task_completed_tag_id", "completed", "tag", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(index=True, max_length=200)
     description: Optional[str] = Field(default=None, max_length=2000)
     tag: Optional[str] = Field(default=None, index=True, max_length=50)
     completed: bool = Field(default=False, index=True)
+    # Bumped by every UPDATE statement (ORM or Core); feeds ETags and If-Match.
+    # The server defaults are the ones migration 5b7d0c3e1f92 added the columns with.
+    version: int = Field(
+        default=1,
+        sa_column_kwargs={"onupdate": literal_column("version") + 1, "server_default": text("1")},
+    )
+    updated_at: datetime = Field(
+        default_factory=utcnow,
+        sa_column_kwargs={
+            "onupdate": utcnow,
+            "server_default": text("'1970-01-01 00:00:00'"),
+        },
+    )
+
+
+class TaskStats(SQLModel, table=True):
+    """Per-tag task counters kept current by triggers on ``task`` (see app/stats.py)."""
+
+    __tablename__ = "task_stats"
+
+    # '' stands for untagged tasks: a primary key cannot be NULL.
+    tag: str = Field(primary_key=True, max_length=50)
+    total: int = Field(default=0)
+    completed: int = Field(default=0)
+
+
+class TaskChange(SQLModel, table=True):
+    """Append-only log of task writes, filled by triggers on ``task`` (see app/changes.py)."""
+
+    __tablename__ = "task_change"
+    # Ids are event ids for SSE resume, so SQLite must never reuse one.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    # BIGINT on Postgres; SQLite only autoincrements an INTEGER primary key.
+    id: Optional[int] = Field(
+        default=None, primary_key=True, sa_type=BigInteger().with_variant(Integer, "sqlite")
+    )
+    op: str = Field(max_length=10)  # created | updated | completed | deleted
+    task_id: int
+    tag: Optional[str] = Field(default=None, max_length=50)
+    # The tag an update moved the task away from, so tag-filtered feeds see it leave.
+    prev_tag: Optional[str] = Field(default=None, max_length=50)
+    version: int
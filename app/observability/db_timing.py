@@ -0,0 +1,201 @@
+"""Per-request database timing.
+
+Class-level engine events count every statement and its duration into the
+``QueryStats`` bound to the current request. The stats live in a contextvar,
+which both the threadpool and the greenlet (async engine) paths inherit.
+``instrument_pool`` adds checkout-wait timing and pool saturation gauges for the
+app's own engines. ``DBTimingMiddleware`` turns the totals into Prometheus
+histograms and a ``Server-Timing`` header; the access log reads them through
+``log_fields``.
+
+Repeating one statement ``DB_N_PLUS_ONE_THRESHOLD`` times within a request is
+reported as a likely N+1 (warning log plus ``db_n_plus_one_total``).
+"""
+
+import contextvars
+import logging
+import os
+from collections import Counter as _Counter
+from time import perf_counter
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DB_TIMING = os.getenv("DB_TIMING", "1") in ("1", "true", "True")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", "10"))
+
+log = logging.getLogger(__name__)
+
+REQUEST_QUERIES = Histogram(
+    "db_request_queries",
+    "SQL statements executed per HTTP request.",
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "db_request_seconds",
+    "Time spent executing SQL per HTTP request.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time waiting for a pooled connection.",
+    ["pool"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections checked out.", ["pool"])
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Overflow connections in use.", ["pool"])
+POOL_SIZE = Gauge("db_pool_size", "Configured pool size (DB_POOL_SIZE).", ["pool"])
+POOL_MAX_OVERFLOW = Gauge(
+    "db_pool_max_overflow", "Configured overflow limit (DB_MAX_OVERFLOW).", ["pool"]
+)
+N_PLUS_ONE = Counter("db_n_plus_one_total", "Requests that repeated one statement too often.")
+
+
+class QueryStats:
+    __slots__ = ("queries", "db_seconds", "checkout_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.checkout_seconds = 0.0
+        self.statements: _Counter = _Counter()
+
+    def repeated_statement(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> Optional[tuple]:
+        """``(statement, count)`` of the most repeated statement if it reaches ``threshold``."""
+        if self.queries < threshold:
+            return None
+        statement, count = self.statements.most_common(1)[0]
+        return (statement, count) if count >= threshold else None
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries", '
+            f"db-checkout;dur={self.checkout_seconds * 1000:.2f}"
+        )
+
+
+_stats: contextvars.ContextVar = contextvars.ContextVar("db_stats", default=None)
+
+
+def log_fields() -> dict:
+    """Access-log fields for the current request; empty outside ``DBTimingMiddleware``."""
+    stats = _stats.get()
+    if stats is None:
+        return {}
+    fields = {
+        "db_queries": stats.queries,
+        "db_ms": round(stats.db_seconds * 1000, 2),
+        "db_checkout_ms": round(stats.checkout_seconds * 1000, 2),
+    }
+    if stats.repeated_statement():
+        fields["n_plus_one"] = True
+    return fields
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _stats.get() is not None:
+        context._db_timing_start = perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats.get()
+    start = getattr(context, "_db_timing_start", None)
+    if stats is None or start is None:
+        return
+    stats.queries += 1
+    stats.db_seconds += perf_counter() - start
+    stats.statements[statement] += 1
+
+
+def instrument_pool(engine: Engine, name: str = "primary") -> None:
+    """Time connection checkouts and export saturation gauges for ``engine``'s pool."""
+    pool = engine.pool
+    if getattr(pool, "_db_timing", False):
+        return
+    pool._db_timing = True
+    do_get, do_return = pool._do_get, pool._do_return_conn
+    saturation = isinstance(pool, QueuePool)
+    if saturation:
+        POOL_SIZE.labels(name).set(pool.size())
+        POOL_MAX_OVERFLOW.labels(name).set(pool._max_overflow)
+
+    def _update():
+        if saturation:
+            POOL_CHECKED_OUT.labels(name).set(pool.checkedout())
+            POOL_OVERFLOW.labels(name).set(max(0, pool.overflow()))
+
+    # Checkout/checkin events fire before the pool's counters change and nothing fires
+    # before a checkout starts waiting, so the pool's own getter and returner are wrapped.
+    def _timed_do_get():
+        start = perf_counter()
+        try:
+            return do_get()
+        finally:
+            waited = perf_counter() - start
+            CHECKOUT_WAIT.labels(name).observe(waited)
+            stats = _stats.get()
+            if stats is not None:
+                stats.checkout_seconds += waited
+            _update()
+
+    def _counted_do_return(record):
+        try:
+            do_return(record)
+        finally:
+            _update()
+
+    pool._do_get = _timed_do_get
+    pool._do_return_conn = _counted_do_return
+
+
+class DBTimingMiddleware:
+    """Collects ``QueryStats`` per request; adds ``Server-Timing`` and records histograms.
+
+    Add it outside ``RequestIDMiddleware`` so the access log still sees the stats.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not DB_TIMING:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+
+        async def _send(message: Message):
+            if message["type"] == "http.response.start" and stats.queries:
+                header = (b"server-timing", stats.server_timing().encode("latin-1"))
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        token = _stats.set(stats)
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _stats.reset(token)
+            self._record(scope, stats)
+
+    @staticmethod
+    def _record(scope: Scope, stats: QueryStats) -> None:
+        if not stats.queries:
+            return
+        REQUEST_QUERIES.observe(stats.queries)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds)
+        repeated = stats.repeated_statement()
+        if repeated:
+            N_PLUS_ONE.inc()
+            log.warning(
+                "Possible N+1: statement ran %d times in %s %s: %.200s",
+                repeated[1],
+                scope["method"],
+                scope["path"],
+                repeated[0],
+            )
@@ -1,22 +1,59 @@
 import contextvars
+import logging
 import uuid
+from time import perf_counter
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.observability.db_timing import log_fields
 
 request_id_ctx = contextvars.ContextVar("request_id", default=None)
+logger = logging.getLogger("app")
+
+
+class RequestIDMiddleware:
+    """Binds ``x-request-id`` for the request, echoes it back and writes the access log."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        rid = headers.get("x-request-id") or str(uuid.uuid4())
+        rid_header = (b"x-request-id", rid.encode("latin-1"))
+        status_code = 500
+        start = perf_counter()
 
+        async def _send(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), rid_header]
+            await send(message)
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        rid = request.headers.get("x-request-id") or str(uuid.uuid4())
         token = request_id_ctx.set(rid)
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, _send)
         finally:
             request_id_ctx.reset(token)
-        response.headers["x-request-id"] = rid
-        return response
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "request",
+                    extra={
+                        "request_id": rid,
+                        "path": scope["path"],
+                        "method": scope["method"],
+                        "status_code": status_code,
+                        "duration_ms": round((perf_counter() - start) * 1000, 2),
+                        "user_agent": headers.get("user-agent", ""),
+                        **log_fields(),
+                    },
+                )
 
 
 def get_request_id() -> str:
@@ -0,0 +1,25 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+MAX_ID = 2**63 - 1
+
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque keyset cursor pointing just past ``last_id``."""
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = int(data["id"])
+    except (ValueError, KeyError, TypeError, OverflowError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+    # Ids are BIGINT at most; a larger bound parameter is a driver error, not a 400.
+    if not 0 <= last_id <= MAX_ID:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
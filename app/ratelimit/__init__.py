@@ -0,0 +1,29 @@
+"""Pluggable request rate limiting.
+
+``RL_BACKEND=memory`` (default) keeps counters per process; ``RL_BACKEND=redis``
+shares them across gunicorn workers and instances via ``RL_REDIS_URL``.
+"""
+
+import os
+
+from app.ratelimit.base import RateLimitResult, RateLimitStore, sliding_window
+from app.ratelimit.memory import MemoryStore
+from app.ratelimit.redis_store import RedisStore
+
+__all__ = [
+    "MemoryStore",
+    "RateLimitResult",
+    "RateLimitStore",
+    "RedisStore",
+    "build_store",
+    "sliding_window",
+]
+
+
+def build_store(backend: str = None) -> RateLimitStore:
+    backend = backend or os.getenv("RL_BACKEND", "memory")
+    if backend == "memory":
+        return MemoryStore(max_keys=int(os.getenv("RL_MAX_KEYS", "100000")))
+    if backend == "redis":
+        return RedisStore.from_url(os.environ["RL_REDIS_URL"])
+    raise ValueError(f"Unknown RL_BACKEND: {backend!r}")
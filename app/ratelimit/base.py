@@ -0,0 +1,38 @@
+import math
+from dataclasses import dataclass
+from typing import Protocol
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int  # seconds until the current window rolls over
+    retry_after: int = 0  # seconds until a denied client may try again
+
+
+class RateLimitStore(Protocol):
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult: ...
+
+
+def sliding_window(prev: int, cur: int, now: float, window: int, limit: int) -> RateLimitResult:
+    """Sliding-window counter: the previous window's count is weighted by how much of
+    it still overlaps the trailing ``window`` seconds. ``cur`` must not yet include the
+    request being decided.
+    """
+    into = now % window
+    weight = 1 - into / window
+    estimate = prev * weight + cur
+    reset = max(1, math.ceil(window - into))
+    if estimate + 1 <= limit:
+        return RateLimitResult(True, limit, max(0, math.floor(limit - estimate - 1)), reset)
+
+    if cur + 1 > limit:
+        # Only the next window can help, once this window's count has decayed enough.
+        need = 1 - (limit - 1) / cur if cur else 0
+        wait = (window - into) + window * need
+    else:
+        need = 1 - (limit - 1 - cur) / prev
+        wait = window * need - into
+    return RateLimitResult(False, limit, 0, reset, max(1, math.ceil(wait)))
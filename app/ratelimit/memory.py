@@ -0,0 +1,49 @@
+import time
+from collections import OrderedDict
+
+from app.ratelimit.base import RateLimitResult, sliding_window
+
+
+class MemoryStore:
+    """Per-process sliding-window counters.
+
+    Each client costs one ``[window_index, prev, cur]`` entry. Entries are kept in
+    LRU order and dropped once they are two windows old (they no longer affect
+    any decision) or when ``max_keys`` is exceeded, so memory stays bounded by
+    the number of recently active clients.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock=time.time):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        now = self.clock()
+        idx = int(now // window)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [idx, 0, 0]
+        else:
+            self._entries.move_to_end(key)
+            if entry[0] != idx:
+                entry[1] = entry[2] if entry[0] == idx - 1 else 0
+                entry[2] = 0
+                entry[0] = idx
+
+        result = sliding_window(entry[1], entry[2], now, window, limit)
+        if result.allowed:
+            entry[2] += 1
+        self._evict(idx)
+        return result
+
+    def _evict(self, idx: int) -> None:
+        entries = self._entries
+        while entries:
+            entry = next(iter(entries.values()))
+            if entry[0] >= idx - 1 and len(entries) <= self.max_keys:
+                break
+            entries.popitem(last=False)
@@ -0,0 +1,45 @@
+import logging
+import time
+
+from app.ratelimit.base import RateLimitResult, sliding_window
+
+log = logging.getLogger(__name__)
+
+
+class RedisStore:
+    """Sliding-window counters in a Redis-protocol server, shared by every worker.
+
+    ``client`` is anything exposing the redis-py asyncio API used here
+    (``pipeline``, ``decr``). Redis errors fail open: the request is allowed and
+    the error logged, so a cache outage doesn't take the API down with it.
+    """
+
+    def __init__(self, client, prefix: str = "rl", clock=time.time):
+        self.client = client
+        self.prefix = prefix
+        self.clock = clock
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisStore":
+        import redis.asyncio as redis  # optional dependency, only needed for RL_BACKEND=redis
+
+        return cls(redis.from_url(url))
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        now = self.clock()
+        idx = int(now // window)
+        cur_key = f"{self.prefix}:{key}:{idx}"
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.incr(cur_key)
+                pipe.expire(cur_key, window * 2)
+                pipe.get(f"{self.prefix}:{key}:{idx - 1}")
+                cur, _, prev = await pipe.execute()
+            result = sliding_window(int(prev or 0), int(cur) - 1, now, window, limit)
+            if not result.allowed:
+                # Denied hits don't count, matching MemoryStore.
+                await self.client.decr(cur_key)
+            return result
+        except Exception:
+            log.warning("Rate limit store unavailable; allowing request", exc_info=True)
+            return RateLimitResult(True, limit, limit, window)
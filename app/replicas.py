@@ -0,0 +1,273 @@
+"""Read-replica routing for the task read endpoints.
+
+``DATABASE_REPLICA_URLS`` is a comma-separated list of replica URLs. Reads
+that depend on ``get_read_session`` are sent to them round-robin. Writes keep
+using ``get_session`` (the primary). Reads fall back to the primary when:
+
+- no replica is configured or every replica is marked down;
+- the client wrote within ``REPLICA_READ_AFTER_WRITE_SECS``. After a
+  successful write ``ReadAfterWriteMiddleware`` sets a ``read_primary`` cookie
+  holding the (wall-clock) expiry, signed with ``REPLICA_PIN_SECRET``. The pin
+  travels with the client, so it holds on any worker or host that shares the
+  secret, and clients behind one address do not pin each other.
+
+A replica is marked down for ``REPLICA_RETRY_SECS`` when a read on it fails
+with a connection error, and read endpoints wrapped in ``primary_fallback`` run
+once more on the primary, so the request that hit the failure still succeeds.
+An export is retried only if its query fails, not once rows are streaming. A
+replica is also marked down when the background health check (every
+``REPLICA_HEALTH_INTERVAL_SECS``) cannot run ``SELECT 1`` or, on Postgres, sees
+replay lag above ``REPLICA_MAX_LAG_SECS``.
+
+The read cache can be filled from a replica, so an entry may be as stale as the
+replica lag plus ``CACHE_TTL_SECS``.
+"""
+
+import asyncio
+import functools
+import hashlib
+import hmac
+import inspect
+import itertools
+import logging
+import math
+import os
+import secrets
+import time
+from typing import List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db import DB_ASYNC, async_url, engine_kwargs, get_session
+from app.observability.db_timing import instrument_pool
+
+log = logging.getLogger(__name__)
+
+REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+READ_AFTER_WRITE_SECS = float(os.getenv("REPLICA_READ_AFTER_WRITE_SECS", "5"))
+RETRY_SECS = float(os.getenv("REPLICA_RETRY_SECS", "30"))
+HEALTH_INTERVAL_SECS = float(os.getenv("REPLICA_HEALTH_INTERVAL_SECS", "10"))
+MAX_LAG_SECS = float(os.getenv("REPLICA_MAX_LAG_SECS", "30"))
+# Unset: a random key per process, shared by workers only with GUNICORN_PRELOAD=1.
+PIN_SECRET = os.getenv("REPLICA_PIN_SECRET", "")
+PIN_COOKIE = "read_primary"
+
+_LAG_SQL = text("SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)")
+_UNSAFE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+_PIN_KEY = (PIN_SECRET or secrets.token_hex(32)).encode()
+# Session.info keys set on replica sessions for primary_fallback.
+_REPLICA_ENGINE = "replica_engine"
+_PRIMARY_SESSION = "primary_session"
+
+
+class ReplicaPool:
+    def __init__(
+        self,
+        engines: List,
+        read_after_write: float = READ_AFTER_WRITE_SECS,
+        retry_secs: float = RETRY_SECS,
+        clock=time.monotonic,
+        wall_clock=time.time,
+    ):
+        self.engines = list(engines)
+        self.read_after_write = read_after_write
+        self.retry_secs = retry_secs
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self._next = itertools.cycle(range(len(self.engines)))
+        self._down_until = [0.0] * len(self.engines)
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def pin(self) -> str:
+        """Cookie value for a client that just wrote: ``<expiry>.<signature>``."""
+        until = math.ceil(self.wall_clock() + self.read_after_write)
+        return f"{until}.{_sign(until)}"
+
+    def pinned(self, token: Optional[str]) -> bool:
+        """Whether ``token`` (from ``pin``) is genuine and not yet expired."""
+        until, _, sig = (token or "").partition(".")
+        if not until.isdigit() or not hmac.compare_digest(sig, _sign(int(until))):
+            return False
+        return int(until) > self.wall_clock()
+
+    def pick(self):
+        """Next healthy replica engine, or ``None`` to use the primary."""
+        now = self.clock()
+        for _ in range(len(self.engines)):
+            i = next(self._next)
+            if self._down_until[i] <= now:
+                return self.engines[i]
+        return None
+
+    def mark_down(self, engine, reason: str = "") -> None:
+        i = self.engines.index(engine)
+        if self._down_until[i] <= self.clock():
+            log.warning("Replica %d marked down for %ss: %s", i, self.retry_secs, reason)
+        self._down_until[i] = self.clock() + self.retry_secs
+
+    def mark_up(self, engine) -> None:
+        i = self.engines.index(engine)
+        if self._down_until[i] > self.clock():
+            log.info("Replica %d is healthy again", i)
+        self._down_until[i] = 0.0
+
+    async def check(self) -> None:
+        """Probe every replica once and update its state."""
+        for engine in self.engines:
+            try:
+                if isinstance(engine, AsyncEngine):
+                    async with engine.connect() as conn:
+                        lag = await conn.run_sync(_probe)
+                else:
+                    lag = await run_in_threadpool(_probe_engine, engine)
+            except Exception as exc:
+                self.mark_down(engine, f"health check failed: {exc}")
+                continue
+            if lag > MAX_LAG_SECS:
+                self.mark_down(engine, f"replication lag {lag:.1f}s")
+            else:
+                self.mark_up(engine)
+
+    async def monitor(self, interval: float = HEALTH_INTERVAL_SECS) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check()
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            if isinstance(engine, AsyncEngine):
+                await engine.dispose()
+            else:
+                engine.dispose()
+
+
+def _sign(until: int) -> str:
+    return hmac.new(_PIN_KEY, str(until).encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def _probe(conn) -> float:
+    """Replay lag in seconds (0 off Postgres); raises if the replica is unreachable."""
+    if conn.dialect.name == "postgresql":
+        return float(conn.execute(_LAG_SQL).scalar() or 0)
+    conn.execute(text("SELECT 1"))
+    return 0.0
+
+
+def _probe_engine(engine) -> float:
+    with engine.connect() as conn:
+        return _probe(conn)
+
+
+def build_replicas(urls: List[str] = REPLICA_URLS) -> ReplicaPool:
+    engines = []
+    for i, url in enumerate(urls):
+        if DB_ASYNC:
+            engine = create_async_engine(async_url(url), **engine_kwargs(url))
+            instrument_pool(engine.sync_engine, f"replica{i}-async")
+        else:
+            engine = create_engine(url, **engine_kwargs(url))
+            instrument_pool(engine, f"replica{i}")
+        engines.append(engine)
+    if engines and not PIN_SECRET:
+        log.warning(
+            "REPLICA_PIN_SECRET is not set: read-after-write pins only hold on this "
+            "process and workers preloaded from it"
+        )
+    return ReplicaPool(engines)
+
+
+replica_pool = build_replicas()
+
+
+async def get_read_session(request: Request, session=Depends(get_session)):
+    """A session on a replica when one is usable for this client, else the primary's.
+
+    Depends on ``get_session`` so primary fallback (and overriding it in tests) keeps
+    working; the primary session opens no connection unless it is used.
+    """
+    pool = replica_pool
+    engine = None
+    if pool and not pool.pinned(request.cookies.get(PIN_COOKIE)):
+        engine = pool.pick()
+    if engine is None:
+        yield session
+        return
+    if isinstance(engine, AsyncEngine):
+        replica = AsyncSession(engine, expire_on_commit=False)
+    else:
+        replica = Session(engine)
+    replica.info.update({_REPLICA_ENGINE: engine, _PRIMARY_SESSION: session})
+    try:
+        yield replica
+    except DBAPIError as exc:
+        if _replica_lost(exc):
+            pool.mark_down(engine, str(exc.orig))
+        raise
+    finally:
+        if isinstance(replica, AsyncSession):
+            await replica.close()
+        else:
+            await run_in_threadpool(replica.close)
+
+
+def _replica_lost(exc: DBAPIError) -> bool:
+    return isinstance(exc, (OperationalError, InterfaceError)) or exc.connection_invalidated
+
+
+def primary_fallback(endpoint):
+    """Wrap a read endpoint taking ``session=Depends(get_read_session)``.
+
+    When the read fails on a replica with a connection error, the replica is marked
+    down and the endpoint runs once more on the primary session.
+    """
+
+    @functools.wraps(endpoint)
+    async def read(*args, **kwargs):
+        session = kwargs["session"]
+        try:
+            return await endpoint(*args, **kwargs)
+        except DBAPIError as exc:
+            engine = session.info.get(_REPLICA_ENGINE)
+            if engine is None or not _replica_lost(exc):
+                raise
+            replica_pool.mark_down(engine, str(exc.orig))
+        return await endpoint(*args, **{**kwargs, "session": session.info[_PRIMARY_SESSION]})
+
+    # FastAPI resolves string annotations against the wrapper's module, not the endpoint's.
+    read.__signature__ = inspect.signature(endpoint, eval_str=True)
+    return read
+
+
+class ReadAfterWriteMiddleware:
+    """Pins a client's reads to the primary for a while after it wrote something."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in _UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def _send(message: Message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                if replica_pool:
+                    MutableHeaders(scope=message).append(
+                        "set-cookie",
+                        f"{PIN_COOKIE}={replica_pool.pin()}; Max-Age="
+                        f"{math.ceil(replica_pool.read_after_write)}; Path=/; HttpOnly; "
+                        "SameSite=Lax",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, _send)
@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class TaskIn(BaseModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    description: Optional[str] = Field(default=None, max_length=2000)
+    tag: Optional[str] = Field(default=None, max_length=50)
+
+
+class TaskOut(TaskIn):
+    id: int
+    completed: bool
+    version: int
+    updated_at: datetime
+
+
+class TaskPatch(BaseModel):
+    """Partial update used by PATCH /tasks/bulk; only fields that are sent change."""
+
+    id: int
+    title: Optional[str] = Field(default=None, min_length=1, max_length=200)
+    description: Optional[str] = Field(default=None, max_length=2000)
+    tag: Optional[str] = Field(default=None, max_length=50)
+
+    @field_validator("title")
+    @classmethod
+    def _title_not_null(cls, v):
+        if v is None:
+            raise ValueError("title may not be null")
+        return v
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: int
+    id: Optional[int] = None
+    task: Optional[TaskOut] = None
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    results: List[BulkItemResult]
+
+
+class TagStats(BaseModel):
+    tag: Optional[str]
+    total: int
+    completed: int
+    open: int
+
+
+class TaskStatsOut(BaseModel):
+    total: int
+    completed: int
+    open: int
+    completion_rate: float
+    tags: List[TagStats]
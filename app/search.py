@@ -0,0 +1,79 @@
+"""Full-text search over title/description/tag.
+
+Postgres uses a generated ``search_vector`` tsvector column with a GIN index;
+SQLite uses an external-content FTS5 table kept in sync by triggers. Both are
+created by the Alembic migration and, for ``create_all`` databases (tests,
+scripts), by the ``after_create`` hook below. ``SEARCH_BACKEND=like`` falls back
+to the old unindexed ILIKE scan.
+"""
+
+import os
+import re
+
+from sqlalchemy import DDL, column, event, func, literal_column, table
+
+from app.models import Task
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "fts")
+
+PG_DDL = (
+    "ALTER TABLE task ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '') "
+    "|| ' ' || coalesce(tag, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_task_search_vector ON task USING gin (search_vector)",
+)
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+    "title, description, tag, content='task', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_fts(rowid, title, description, tag) "
+    "VALUES (new.id, new.title, new.description, new.tag); END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description, tag) "
+    "VALUES ('delete', old.id, old.title, old.description, old.tag); END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description, tag ON task "
+    "BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description, tag) "
+    "VALUES ('delete', old.id, old.title, old.description, old.tag); "
+    "INSERT INTO task_fts(rowid, title, description, tag) "
+    "VALUES (new.id, new.title, new.description, new.tag); END",
+)
+
+for _stmt in PG_DDL:
+    event.listen(Task.__table__, "after_create", DDL(_stmt).execute_if(dialect="postgresql"))
+for _stmt in SQLITE_DDL:
+    event.listen(Task.__table__, "after_create", DDL(_stmt).execute_if(dialect="sqlite"))
+
+_fts = table("task_fts", column("rowid"), column("rank"))
+_search_vector = literal_column("task.search_vector")
+
+
+def tokens(term: str) -> list:
+    return re.findall(r"\w+", term.lower())
+
+
+def apply_search(stmt, dialect: str, term: str, ranked: bool = False):
+    """Filter ``stmt`` to rows matching every word of ``term`` as a prefix.
+
+    With ``ranked`` the best matches come first (callers add their own tiebreak).
+    """
+    words = tokens(term)
+    if not words:
+        return stmt
+    if SEARCH_BACKEND == "fts" and dialect == "postgresql":
+        query = func.to_tsquery("simple", " & ".join(f"{w}:*" for w in words))
+        stmt = stmt.where(_search_vector.op("@@")(query))
+        if ranked:
+            stmt = stmt.order_by(func.ts_rank(_search_vector, query).desc())
+        return stmt
+    if SEARCH_BACKEND == "fts" and dialect == "sqlite":
+        query = " ".join(f'"{w}"*' for w in words)
+        stmt = stmt.join(_fts, _fts.c.rowid == Task.id).where(
+            literal_column("task_fts").op("MATCH")(query)
+        )
+        if ranked:
+            stmt = stmt.order_by(_fts.c.rank)
+        return stmt
+    s = f"%{term.lower()}%"
+    return stmt.where((Task.title.ilike(s)) | (Task.description.ilike(s)) | (Task.tag.ilike(s)))
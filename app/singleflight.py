@@ -0,0 +1,71 @@
+"""Single-flight for identical concurrent task reads.
+
+When many clients ask for the same page at once (a popular tag's list on a
+cold cache), each would run the same query and hold its own pool connection.
+``read_flights.do(key, fn)`` runs ``fn`` once per key at a time. Callers that
+arrive with the same key while it runs wait for that run and get the same
+result object (or the same exception). The result must be treated as
+read-only, as cached lists already are.
+
+Keys hold everything the result depends on: the engine the read goes to
+(primary or replica), the normalized filters, page and projection, and the
+cache generation. Writes in this worker call ``forget()`` (through
+``TaskCache.invalidate``), so a read that starts after a write never joins a
+flight that started before it. Writes in other workers are seen by the next
+flight, as with the per-worker cache.
+
+The shared run is a task of its own, on a session of its own
+(``app.db.run_on``), so a caller that goes away (client disconnect) neither
+cancels it nor closes its session under the others. ``SINGLE_FLIGHT=0`` turns
+the layer off.
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Hashable
+
+from prometheus_client import Counter
+
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1") in ("1", "true", "True")
+
+FLIGHTS = Counter(
+    "singleflight_requests_total",
+    "Reads that ran a query (leader) or shared one already in flight (coalesced).",
+    ["kind", "result"],
+)
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, kind: str, key: Hashable, fn: Callable[[], Awaitable]):
+        if not self.enabled:
+            return await fn()
+        key = (kind, key)
+        flight = self._flights.get(key)
+        if flight is None:
+            FLIGHTS.labels(kind, "leader").inc()
+            flight = asyncio.ensure_future(fn())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda f: self._landed(key, f))
+        else:
+            FLIGHTS.labels(kind, "coalesced").inc()
+        return await asyncio.shield(flight)
+
+    def forget(self) -> None:
+        """Send later callers to a new flight; callers already waiting keep theirs."""
+        self._flights.clear()
+
+    def _landed(self, key, flight: asyncio.Future) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            flight.exception()  # retrieved, even if every caller went away
+
+
+read_flights = SingleFlight(enabled=SINGLE_FLIGHT)
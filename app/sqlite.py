@@ -0,0 +1,104 @@
+"""SQLite production mode: WAL, connection pragmas, pooled readers and one writer.
+
+Used for file-backed ``sqlite`` URLs (edge deployments, scripts). Every connection
+gets WAL journaling, ``synchronous=NORMAL`` and cache/mmap pragmas on connect,
+so readers never block the writer and the writer never blocks readers.
+
+SQLite allows one writer at a time. Left to race, threadpool handlers fail with
+"database is locked": a deferred transaction cannot upgrade its read lock while
+another connection is writing. So writes go through a dedicated engine with a
+single pooled connection. Its transactions start with ``BEGIN IMMEDIATE``, so
+the write lock is taken up front. Handlers queue for that connection in the
+pool (``db_pool_checkout_wait_seconds{pool="writer"}``), not on the file lock.
+``busy_timeout`` covers other processes (gunicorn workers, scripts) sharing
+the file.
+
+``RoutingSession`` sends a transaction's statements to the reader pool until
+the first INSERT/UPDATE/DELETE or flush, and to the writer from then until it
+ends. A transaction therefore reads its own writes.
+"""
+
+import os
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.sql.dml import UpdateBase
+from sqlmodel import Session, create_engine
+
+SQLITE_SINGLE_WRITER = os.getenv("SQLITE_SINGLE_WRITER", "1") in ("1", "true", "True")
+SQLITE_WRITE_TIMEOUT_SECS = float(os.getenv("SQLITE_WRITE_TIMEOUT_SECS", "30"))
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": BUSY_TIMEOUT_MS,
+    # Negative cache_size is in KiB.
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+
+def is_file_url(url: str) -> bool:
+    """True for SQLite URLs backed by a file (WAL needs one; ``:memory:`` is per connection)."""
+    u = make_url(url)
+    if u.get_backend_name() != "sqlite":
+        return False
+    return bool(u.database) and u.database != ":memory:" and "mode=memory" not in str(u)
+
+
+def apply_pragmas(engine: Engine) -> None:
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        for name, value in PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def begin_immediate(engine: Engine) -> None:
+    """Start every transaction on ``engine`` with BEGIN IMMEDIATE (takes the write lock)."""
+
+    @event.listens_for(engine, "connect")
+    def _no_implicit_begin(dbapi_conn, record):
+        # pysqlite would otherwise emit its own deferred BEGIN before the first DML.
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+class RoutingSession(Session):
+    """Session reading from ``bind`` and writing through ``writer`` (see module docstring)."""
+
+    def __init__(self, bind: Engine, writer: Engine, **kwargs):
+        super().__init__(bind, **kwargs)
+        self.writer = writer
+        self._writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._writing or self._flushing or isinstance(clause, UpdateBase):
+            self._writing = True
+            return self.writer
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _back_to_readers(session, transaction):
+    if transaction.parent is None:
+        session._writing = False
+
+
+def writer_for(url: str, engine_kwargs: dict) -> Optional[Engine]:
+    """The single-connection write engine for ``url``, or ``None`` outside SQLite file mode."""
+    if not (SQLITE_SINGLE_WRITER and is_file_url(url)):
+        return None
+    kwargs = {**engine_kwargs, "pool_size": 1, "max_overflow": 0}
+    kwargs["pool_timeout"] = SQLITE_WRITE_TIMEOUT_SECS
+    writer = create_engine(url, **kwargs)
+    apply_pragmas(writer)
+    begin_immediate(writer)
+    return writer
@@ -0,0 +1,151 @@
+"""GET /tasks/stats: task counts overall and per tag.
+
+The numbers come from ``task_stats``, which holds one row per tag (``''`` for
+untagged tasks). Row triggers on ``task`` update it in the writing transaction,
+so every write path is counted, including single and bulk endpoints and plain
+SQL. Reading stats never scans ``task``. The Alembic migration installs the
+triggers. For ``create_all`` databases (tests, scripts) the ``after_create``
+hook below installs them.
+
+    python -m app.stats check     # compare with a GROUP BY over task; exit 1 on drift
+    python -m app.stats rebuild   # recompute task_stats from task
+"""
+
+import sys
+from typing import List
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import DDL, Integer, cast, delete, event, func, insert, text
+from sqlmodel import Session, SQLModel, select
+
+from app.db import engine, run_db
+from app.models import Task, TaskStats
+from app.replicas import get_read_session
+from app.schemas import TaskStatsOut
+
+SQLITE_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS task_stats_ai AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_stats(tag, total, completed) "
+    "VALUES (coalesce(new.tag, ''), 1, new.completed) "
+    "ON CONFLICT(tag) DO UPDATE SET total = total + 1, "
+    "completed = completed + excluded.completed; END",
+    "CREATE TRIGGER IF NOT EXISTS task_stats_ad AFTER DELETE ON task BEGIN "
+    "UPDATE task_stats SET total = total - 1, completed = completed - old.completed "
+    "WHERE tag = coalesce(old.tag, ''); END",
+    "CREATE TRIGGER IF NOT EXISTS task_stats_au AFTER UPDATE OF tag, completed ON task BEGIN "
+    "UPDATE task_stats SET total = total - 1, completed = completed - old.completed "
+    "WHERE tag = coalesce(old.tag, ''); "
+    "INSERT INTO task_stats(tag, total, completed) "
+    "VALUES (coalesce(new.tag, ''), 1, new.completed) "
+    "ON CONFLICT(tag) DO UPDATE SET total = total + 1, "
+    "completed = completed + excluded.completed; END",
+)
+
+PG_DDL = (
+    "CREATE OR REPLACE FUNCTION task_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$ "
+    "BEGIN "
+    "IF TG_OP IN ('DELETE', 'UPDATE') THEN "
+    "UPDATE task_stats SET total = total - 1, completed = completed - OLD.completed::int "
+    "WHERE tag = coalesce(OLD.tag, ''); "
+    "END IF; "
+    "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+    "INSERT INTO task_stats AS s (tag, total, completed) "
+    "VALUES (coalesce(NEW.tag, ''), 1, NEW.completed::int) "
+    "ON CONFLICT (tag) DO UPDATE SET total = s.total + 1, "
+    "completed = s.completed + excluded.completed; "
+    "END IF; "
+    "RETURN NULL; "
+    "END $$",
+    "DROP TRIGGER IF EXISTS task_stats_trg ON task",
+    # UPDATE OF limits the trigger to writes that can move a counter.
+    "CREATE TRIGGER task_stats_trg AFTER INSERT OR DELETE OR UPDATE OF tag, completed ON task "
+    "FOR EACH ROW EXECUTE FUNCTION task_stats_apply()",
+)
+
+# On the metadata, so both task and task_stats exist before the triggers are created.
+for _stmt in SQLITE_DDL:
+    event.listen(SQLModel.metadata, "after_create", DDL(_stmt).execute_if(dialect="sqlite"))
+for _stmt in PG_DDL:
+    event.listen(SQLModel.metadata, "after_create", DDL(_stmt).execute_if(dialect="postgresql"))
+
+router = APIRouter(prefix="/tasks", tags=["stats"])
+
+
+def read_stats(session: Session) -> dict:
+    rows = session.exec(
+        select(TaskStats.tag, TaskStats.total, TaskStats.completed)
+        .where(TaskStats.total > 0)
+        .order_by(TaskStats.tag)
+    ).all()
+    tags = [
+        {"tag": tag or None, "total": total, "completed": done, "open": total - done}
+        for tag, total, done in rows
+    ]
+    total = sum(t["total"] for t in tags)
+    completed = sum(t["completed"] for t in tags)
+    return {
+        "total": total,
+        "completed": completed,
+        "open": total - completed,
+        "completion_rate": round(completed / total, 4) if total else 0.0,
+        "tags": tags,
+    }
+
+
+def _grouped_counts():
+    """``(tag, total, completed)`` per tag, computed from ``task`` itself."""
+    tag = func.coalesce(Task.tag, "")
+    return select(tag, func.count(), func.sum(cast(Task.completed, Integer))).group_by(tag)
+
+
+def check(session: Session) -> List[tuple]:
+    """``(tag, (total, completed) in task, (total, completed) in task_stats)`` per drift."""
+    actual = {t: (n, done) for t, n, done in session.exec(_grouped_counts())}
+    stored = {
+        t: (n, done)
+        for t, n, done in session.exec(
+            select(TaskStats.tag, TaskStats.total, TaskStats.completed).where(
+                (TaskStats.total != 0) | (TaskStats.completed != 0)
+            )
+        )
+    }
+    return [
+        (t, actual.get(t, (0, 0)), stored.get(t, (0, 0)))
+        for t in sorted(actual.keys() | stored.keys())
+        if actual.get(t, (0, 0)) != stored.get(t, (0, 0))
+    ]
+
+
+def rebuild(session: Session) -> None:
+    """Recompute ``task_stats`` from ``task`` in one transaction."""
+    if session.get_bind().dialect.name == "postgresql":
+        # Keeps writers (and so the triggers) out until the new counts are committed.
+        session.exec(text("LOCK TABLE task IN SHARE MODE"))
+    session.exec(delete(TaskStats))
+    session.exec(insert(TaskStats).from_select(["tag", "total", "completed"], _grouped_counts()))
+    session.commit()
+
+
+@router.get("/stats", response_model=TaskStatsOut)
+async def task_stats(session=Depends(get_read_session)):
+    return await run_db(session, read_stats)
+
+
+def main(argv: List[str]) -> int:
+    if argv[1:] not in (["check"], ["rebuild"]):
+        print("usage: python -m app.stats check|rebuild", file=sys.stderr)
+        return 2
+    with Session(engine) as session:
+        if argv[1] == "rebuild":
+            rebuild(session)
+            print("task_stats rebuilt")
+            return 0
+        drift = check(session)
+    for tag, actual, stored in drift:
+        print(f"tag={tag!r}: task has total/completed {actual}, task_stats has {stored}")
+    print("task_stats consistent" if not drift else f"{len(drift)} tag(s) drifted")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
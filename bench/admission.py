@@ -0,0 +1,92 @@
+"""Latency under overload with and without admission control.
+
+    python -m bench.admission --clients 200 --duration 5
+
+A stand-in app holds one of ``--pool`` "connections" (an asyncio.Semaphore)
+for ``--query-ms`` per request and fails with 500 after ``--pool-timeout``
+seconds without one, like a DB pool whose database has slowed down.
+``--clients`` closed-loop clients hammer it, first directly, then through
+``AdmissionMiddleware``. Reports goodput, latency of successful requests,
+and how many got 500 (pool timeout) or 503 (shed).
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.admission import AdaptiveLimiter, AdmissionMiddleware
+
+
+def _pool_app(pool: int, query_ms: float, pool_timeout: float):
+    connections = asyncio.Semaphore(pool)
+
+    async def query(request):
+        try:
+            await asyncio.wait_for(connections.acquire(), pool_timeout)
+        except asyncio.TimeoutError:
+            return PlainTextResponse("pool timeout", status_code=500)
+        try:
+            await asyncio.sleep(query_ms / 1000)
+        finally:
+            connections.release()
+        return PlainTextResponse("ok")
+
+    return Starlette(routes=[Route("/q", query)])
+
+
+async def _run(app, clients: int, duration: float) -> tuple:
+    ok, statuses = [], {}
+    began = time.perf_counter()
+    stop = began + duration
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def loop():
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                r = await client.get("/q")
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                if r.status_code == 200:
+                    ok.append((time.perf_counter() - start) * 1000)
+                else:
+                    await asyncio.sleep(0.05)  # a client backing off
+
+        await asyncio.gather(*(loop() for _ in range(clients)))
+    elapsed = time.perf_counter() - began
+    p99 = statistics.quantiles(ok, n=100)[98] if len(ok) > 1 else float("nan")
+    return len(ok) / elapsed, statistics.median(ok), p99, statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--pool", type=int, default=15)
+    parser.add_argument("--query-ms", type=float, default=50)
+    parser.add_argument("--pool-timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    print(
+        f"{args.clients} clients, pool {args.pool}, {args.query_ms:g} ms/query, "
+        f"pool timeout {args.pool_timeout:g}s"
+    )
+    print(f"{'mode':>10} {'ok/s':>7} {'p50 ms':>8} {'p99 ms':>8} {'500':>6} {'503':>6}")
+    for name in ("direct", "admission"):
+        app = _pool_app(args.pool, args.query_ms, args.pool_timeout)
+        if name == "admission":
+            app = AdmissionMiddleware(app, limiter=AdaptiveLimiter())
+        rate, p50, p99, statuses = asyncio.run(_run(app, args.clients, args.duration))
+        print(
+            f"{name:>10} {rate:>7.0f} {p50:>8.1f} {p99:>8.1f} "
+            f"{statuses.get(500, 0):>6} {statuses.get(503, 0):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
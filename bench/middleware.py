@@ -0,0 +1,102 @@
+"""Per-request overhead of the middleware stack, measured straight through ASGI.
+
+    python -m bench.middleware --requests 5000
+
+Reports requests/sec and peak traced KiB allocated per request for /health and
+/tasks/{id} (SQLite). Run it on two commits to compare stacks.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("RL_MAX_REQS", str(10**9))
+
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from app.main import app, get_session  # noqa: E402
+from app.models import Task  # noqa: E402
+
+
+def _scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"user-agent", b"bench")],
+        "client": ("127.0.0.1", 12345),
+        "server": ("bench", 80),
+    }
+
+
+async def _call(path: str) -> int:
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(_scope(path), receive, send)
+    return status
+
+
+async def run(path: str, n: int) -> tuple:
+    for _ in range(50):
+        assert await _call(path) == 200
+    start = time.perf_counter()
+    for _ in range(n):
+        await _call(path)
+    rps = n / (time.perf_counter() - start)
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(n, 500)):
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await _call(path)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return rps, sum(peaks) / len(peaks) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as s:
+        task = Task(title="bench", description="x" * 200, tag="bench")
+        s.add(task)
+        s.commit()
+        task_id = task.id
+
+    def _session():
+        with Session(engine) as s:
+            yield s
+
+    app.dependency_overrides[get_session] = _session
+    print(f"{'path':>12} {'req/s':>10} {'peak KiB/req':>14}")
+    for path in ("/health", f"/tasks/{task_id}"):
+        rps, kib = asyncio.run(run(path, args.requests))
+        print(f"{path:>12} {rps:>10.0f} {kib:>14.1f}")
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
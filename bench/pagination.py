@@ -0,0 +1,88 @@
+"""Offset vs. cursor pagination latency across page depth.
+
+    python -m bench.pagination --rows 200000 --page-size 50
+
+Seeds a throwaway SQLite database (or ``--db-url``) and times GET /tasks/ at
+increasing depths in both modes through the full ASGI stack.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("RL_MAX_REQS", str(10**9))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from app.main import app, get_session  # noqa: E402
+from app.models import Task  # noqa: E402
+from app.pagination import encode_cursor  # noqa: E402
+
+
+def seed(engine, rows: int) -> None:
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            batch.append({"title": f"task {i}", "tag": "bench", "completed": False})
+            if len(batch) == 10_000:
+                conn.execute(insert(Task), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Task), batch)
+
+
+def timed(client: TestClient, url: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        r = client.get(url)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert r.status_code == 200, r.text
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(db_url)
+    SQLModel.metadata.create_all(engine)
+    seed(engine, args.rows)
+
+    def _session():
+        with Session(engine) as s:
+            yield s
+
+    app.dependency_overrides[get_session] = _session
+    client = TestClient(app)
+
+    with engine.connect() as conn:
+        first_id = conn.exec_driver_sql("SELECT min(id) FROM task").scalar()
+
+    total_pages = args.rows // args.page_size
+    print(f"{'page':>8} {'offset ms':>10} {'cursor ms':>10}")
+    for page in sorted({1, 10, 100, 1000, total_pages // 2, total_pages}):
+        if page < 1 or page > total_pages:
+            continue
+        base = f"/tasks/?tag=bench&page_size={args.page_size}"
+        off = timed(client, f"{base}&page={page}", args.repeat)
+        last_id = first_id + (page - 1) * args.page_size - 1
+        cur = encode_cursor(last_id) if page > 1 else ""
+        kc = timed(client, f"{base}&cursor={cur}", args.repeat)
+        print(f"{page:>8} {off:>10.2f} {kc:>10.2f}")
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
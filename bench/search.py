@@ -0,0 +1,82 @@
+"""ILIKE scan vs. indexed full-text search on a large task table.
+
+    python -m bench.search --rows 1000000
+    python -m bench.search --db-url postgresql+psycopg://... --rows 1000000
+
+Seeds a throwaway database (SQLite by default) with synthetic tasks and times
+the list_tasks query for a few terms under both SEARCH_BACKEND modes.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import crud, search
+from app.models import Task
+
+_rnd = random.Random(7)
+WORDS = sorted({"".join(_rnd.choices("abcdefghijklmnopqrstuvwxyz", k=7)) for _ in range(5000)})
+
+
+def seed(engine, rows: int) -> None:
+    rnd = random.Random(42)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            batch.append(
+                {
+                    "title": " ".join(rnd.sample(WORDS, 3)) + f" {i}",
+                    "description": " ".join(rnd.choices(WORDS, k=20)),
+                    "tag": rnd.choice(WORDS),
+                    "completed": False,
+                }
+            )
+            if len(batch) == 10_000:
+                conn.execute(insert(Task), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Task), batch)
+
+
+def timed(engine, term: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        with Session(engine) as session:
+            start = time.perf_counter()
+            crud.list_tasks(session, search=term, limit=50)
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(db_url)
+    SQLModel.metadata.create_all(engine)
+    start = time.perf_counter()
+    seed(engine, args.rows)
+    print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'term':>20} {'like ms':>10} {'fts ms':>10}")
+    terms = (WORDS[0], f"{WORDS[1]} {WORDS[2]}", WORDS[3][:4], "12345", "nomatch")
+    for term in terms:
+        search.SEARCH_BACKEND = "like"
+        like = timed(engine, term, args.repeat)
+        search.SEARCH_BACKEND = "fts"
+        fts = timed(engine, term, args.repeat)
+        print(f"{term:>20} {like:>10.2f} {fts:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""CPU time per full page of GET /tasks/ (fetch + serialize).
+
+    python -m bench.serialization --page-size 500 --repeat 200
+
+Seeds a throwaway SQLite database (or ``--db-url``) and requests the same page
+repeatedly through the full ASGI stack with the read cache disabled, so every
+request pays for the query and the encoding. Reports process CPU time, which
+covers the threadpool as well as the event loop.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("RL_MAX_REQS", str(10**9))
+os.environ.setdefault("CACHE_ENABLED", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from app.main import app, get_session  # noqa: E402
+from app.models import Task  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(db_url)
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Task),
+            [
+                {"title": f"task {i}", "description": "lorem ipsum " * 8, "tag": "bench"}
+                for i in range(args.page_size)
+            ],
+        )
+
+    def _session():
+        with Session(engine) as s:
+            yield s
+
+    app.dependency_overrides[get_session] = _session
+    client = TestClient(app)
+    url = f"/tasks/?tag=bench&page_size={args.page_size}"
+    for _ in range(10):
+        client.get(url)
+
+    cpu, wall = [], []
+    for _ in range(args.repeat):
+        c0, w0 = time.process_time(), time.perf_counter()
+        r = client.get(url)
+        cpu.append((time.process_time() - c0) * 1000)
+        wall.append((time.perf_counter() - w0) * 1000)
+        assert r.status_code == 200 and len(r.json()) == args.page_size, r.text
+    app.dependency_overrides.clear()
+
+    print(f"{engine.dialect.name}: {args.page_size}-row page x {args.repeat}")
+    print(f"  cpu ms  median {statistics.median(cpu):7.2f}  mean {statistics.fmean(cpu):7.2f}")
+    print(f"  wall ms median {statistics.median(wall):7.2f}  mean {statistics.fmean(wall):7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Database queries under a thundering herd of identical list requests.
+
+    python -m bench.singleflight --clients 200 --rounds 20
+
+Each round, ``--clients`` concurrent clients request the same
+``GET /tasks/?tag=hot`` page through ASGI, right after a write has invalidated
+the cache, so every one of them misses. The app runs against a throwaway SQLite
+file with the default pool (5 + 10 overflow). Reports the SELECTs run per round
+and request latency, with single-flight off and then on.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("RL_MAX_REQS", str(10**9))
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+import app.search  # noqa: E402,F401  (FTS triggers for create_all)
+from app import crud  # noqa: E402
+from app.cache import task_cache  # noqa: E402
+from app.main import app, get_session  # noqa: E402
+from app.singleflight import read_flights  # noqa: E402
+
+
+async def _rounds(clients: int, rounds: int, selects: list) -> tuple:
+    transport = httpx.ASGITransport(app=app)
+    latencies, per_round = [], []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def get():
+            start = time.perf_counter()
+            r = await client.get("/tasks/?tag=hot&page_size=50")
+            assert r.status_code == 200, r.status_code
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        for _ in range(rounds):
+            await task_cache.invalidate()  # what a write does
+            before = len(selects)
+            await asyncio.gather(*(get() for _ in range(clients)))
+            per_round.append(len(selects) - before)
+    p95 = statistics.quantiles(latencies, n=20)[18]
+    return statistics.mean(per_round), statistics.median(latencies), p95
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        connect_args={"check_same_thread": False},
+        pool_size=5,
+        max_overflow=10,
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as s:
+        crud.bulk_create(
+            s, [{"title": f"t{i}", "tag": "hot" if i % 2 else "cold"} for i in range(args.tasks)]
+        )
+    selects = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, *rest):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    def _session():
+        with Session(engine) as s:
+            yield s
+
+    app.dependency_overrides[get_session] = _session
+    print(f"{args.clients} identical requests per round, {args.rounds} rounds")
+    print(f"{'single-flight':>13} {'SELECTs/round':>14} {'p50 ms':>8} {'p95 ms':>8}")
+    for enabled in (False, True):
+        read_flights.enabled = enabled
+        n, p50, p95 = asyncio.run(_rounds(args.clients, args.rounds, selects))
+        print(f"{'on' if enabled else 'off':>13} {n:>14.1f} {p50:>8.1f} {p95:>8.1f}")
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
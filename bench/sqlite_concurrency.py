@@ -0,0 +1,101 @@
+"""Concurrent writes and reads on SQLite: default engine vs. the tuned mode of app/sqlite.py.
+
+    python -m bench.sqlite_concurrency --threads 16 --seconds 5
+
+Each thread loops over create, update and a 50-row page read through the crud
+functions, with a fresh session per operation, as the request threadpool does.
+``default`` is the engine the app used before SQLite mode: rollback journal,
+default pool, no writer serialisation. ``tuned`` uses WAL and pragmas, a pool
+of readers and the single writer behind ``RoutingSession``. Reported per setup:
+completed writes/s and reads/s, p99 write latency and "database is locked"
+errors.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+import app.search  # noqa: E402,F401  (FTS triggers for create_all)
+import app.stats  # noqa: E402,F401  (task_stats triggers)
+from app import crud  # noqa: E402
+from app.db import engine_kwargs  # noqa: E402
+from app.sqlite import RoutingSession, apply_pragmas, writer_for  # noqa: E402
+
+
+def _default(url):
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    return engine, lambda: Session(engine)
+
+
+def _tuned(url):
+    engine = create_engine(url, **engine_kwargs(url))
+    apply_pragmas(engine)
+    writer = writer_for(url, engine_kwargs(url))
+    return engine, lambda: RoutingSession(engine, writer)
+
+
+def run(name, factory, threads: int, seconds: float) -> None:
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine, new_session = factory(url)
+    SQLModel.metadata.create_all(engine)
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+    writes, reads, locked, write_ms = [0], [0], [0], []
+
+    def worker(n: int):
+        local_ms = []
+        while time.monotonic() < stop:
+            try:
+                start = time.perf_counter()
+                with new_session() as s:
+                    task = crud.create_task(s, {"title": f"t{n}", "tag": f"tag{n % 4}"})
+                with new_session() as s:
+                    crud.update_task(s, task["id"], {"title": "changed"})
+                local_ms.append((time.perf_counter() - start) * 1000 / 2)
+                with new_session() as s:
+                    crud.list_tasks(s, tag=f"tag{n % 4}", limit=50)
+                with lock:
+                    writes[0] += 2
+                    reads[0] += 1
+            except OperationalError as exc:
+                if "locked" not in str(exc):
+                    raise
+                with lock:
+                    locked[0] += 1
+        with lock:
+            write_ms.extend(local_ms)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    p99 = statistics.quantiles(write_ms, n=100)[98] if len(write_ms) > 1 else float("nan")
+    print(
+        f"{name:>8} {writes[0] / seconds:>10.0f} {reads[0] / seconds:>9.0f} "
+        f"{p99:>12.1f} {locked[0]:>7}"
+    )
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    print(f"{args.threads} threads, {args.seconds:g}s per setup")
+    print(f"{'setup':>8} {'writes/s':>10} {'reads/s':>9} {'p99 write ms':>12} {'locked':>7}")
+    run("default", _default, args.threads, args.seconds)
+    run("tuned", _tuned, args.threads, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,7 @@
 #!/usr/bin/env sh
 set -e
 
-echo "Running migrations..."
-alembic upgrade head || echo "Migrations failed or already applied."
-
-echo "Starting app with Gunicorn (workers=${WEB_CONCURRENCY:-2})..."
-exec gunicorn \
-  -k uvicorn.workers.UvicornWorker \
-  -w "${WEB_CONCURRENCY:-2}" \
-  -b 0.0.0.0:8000 \
-  --access-logfile - \
-  --error-logfile - \
-  app.main:app
+# Migrations run at startup (app/migrate_on_startup.py): a revision check in the
+# gunicorn master, and an upgrade under an advisory lock only if the DB is behind.
+echo "Starting app with Gunicorn (workers=${WEB_CONCURRENCY:-2}, preload=${GUNICORN_PRELOAD:-1})..."
+exec gunicorn -c gunicorn.conf.py app.main:app
@@ -0,0 +1,42 @@
+"""Gunicorn settings used by entrypoint.sh.
+
+With ``GUNICORN_PRELOAD=1`` (the default) the master imports the app once and the
+workers are forked from it, sharing the imported modules copy-on-write instead of
+each importing them. The master also runs the migration check, so workers start
+with it cached. Connections and threads do not survive ``fork``: ``post_fork``
+drops the inherited pools and restarts the queued log writer.
+"""
+
+import os
+
+bind = "0.0.0.0:8000"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+accesslog = "-"
+errorlog = "-"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") in ("1", "true", "True")
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from app.db import engine
+    from app.migrate_on_startup import run_migrations_if_enabled
+
+    run_migrations_if_enabled()
+    # No pooled connection should be left for the workers to inherit.
+    engine.dispose()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app.db import async_engine, engine, write_engine
+    from app.json_logging import restart_after_fork
+    from app.replicas import replica_pool
+
+    # close=False: the parent still owns those sockets; the child just forgets them.
+    for e in (engine, async_engine, write_engine, *replica_pool.engines):
+        if e is not None:
+            getattr(e, "sync_engine", e).dispose(close=False)
+    restart_after_fork()
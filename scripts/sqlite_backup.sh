@@ -7,5 +7,10 @@ REGION="${3:-eu-west-2}"
 STAMP=$(date -u +%Y%m%dT%H%M%SZ)
 OUT="sqlite-$(basename "$DB").$STAMP.gz"
 echo "Backing up $DB -> s3://$BUCKET/$OUT"
-gzip -c "$DB" | aws s3 cp - "s3://$BUCKET/$OUT" --region "$REGION"
+# The app runs SQLite in WAL mode, so recent commits may still sit in "$DB-wal";
+# the online backup API copies a consistent snapshot including them.
+SNAP=$(mktemp)
+trap 'rm -f "$SNAP"' EXIT
+python3 -c 'import sqlite3, sys; sqlite3.connect(sys.argv[1]).backup(sqlite3.connect(sys.argv[2]))' "$DB" "$SNAP"
+gzip -c "$SNAP" | aws s3 cp - "s3://$BUCKET/$OUT" --region "$REGION"
 echo "Uploaded s3://$BUCKET/$OUT"
@@ -7,4 +7,6 @@ BUCKET="${3:?s3 bucket required}"
 REGION="${4:-eu-west-2}"
 echo "Restoring s3://$BUCKET/$KEY -> $DEST"
 aws s3 cp "s3://$BUCKET/$KEY" - --region "$REGION" | gunzip > "$DEST"
+# WAL/shared-memory files left from an older copy would be replayed over the restore.
+rm -f "$DEST-wal" "$DEST-shm"
 echo "Restored to $DEST"
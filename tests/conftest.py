@@ -1,9 +1,20 @@
-import pytest
-from fastapi.testclient import TestClient
-from prometheus_client import REGISTRY
-from sqlmodel import Session, SQLModel, create_engine
+import os
 
-from app.main import app, get_session
+# The suite shares one client address; keep the default limiter out of the way.
+os.environ.setdefault("RL_MAX_REQS", "1000000")
+# The suite runs in one process, where the memory cache is coherent.
+os.environ.setdefault("CACHE_ENABLED", "1")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from prometheus_client import REGISTRY  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.db import async_url  # noqa: E402
+from app.main import app, get_session  # noqa: E402
 
 
 @pytest.fixture(autouse=True, scope="function")
@@ -49,3 +60,21 @@ def test_client(session, tmp_db_url, monkeypatch):
         yield client
     finally:
         app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="function")
+def async_test_client(engine, tmp_db_url):
+    # NullPool: TestClient runs its own event loop, so pooled aiosqlite
+    # connections must not outlive it.
+    async_engine = create_async_engine(async_url(tmp_db_url), poolclass=NullPool)
+
+    async def _override_get_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as s:
+            yield s
+
+    app.dependency_overrides[get_session] = _override_get_session
+    client = TestClient(app)
+    try:
+        yield client
+    finally:
+        app.dependency_overrides.clear()
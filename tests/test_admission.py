@@ -0,0 +1,157 @@
+import asyncio
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app import admission
+from app.admission import AdaptiveLimiter, AdmissionMiddleware
+
+
+def test_queue_admits_writes_first_and_sheds_overflow():
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, queue_size=2, queue_timeout_ms=1000)
+
+    async def scenario():
+        assert await limiter.acquire() is None
+        read = asyncio.ensure_future(limiter.acquire())
+        newer_read = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        full = await limiter.acquire()  # a third read finds the queue full
+        write = asyncio.ensure_future(limiter.acquire(write=True))
+        await asyncio.sleep(0)
+        limiter.release()
+        admitted_write = await write
+        limiter.release()
+        admitted_read = await read
+        return full, await newer_read, admitted_write, admitted_read
+
+    full, evicted, admitted_write, admitted_read = asyncio.run(scenario())
+    assert (full, evicted) == ("queue_full", "evicted")
+    assert admitted_write is None and admitted_read is None
+    assert limiter.inflight == 1 and limiter.queued() == 0
+
+
+def test_queued_request_times_out():
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, queue_timeout_ms=10)
+
+    async def scenario():
+        await limiter.acquire()
+        return await limiter.acquire()
+
+    assert asyncio.run(scenario()) == "timeout"
+    assert limiter.queued() == 0
+
+
+def test_waiter_admitted_as_it_times_out_keeps_its_slot(monkeypatch):
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, queue_timeout_ms=10)
+
+    async def admitted_then_timed_out(waiter, timeout):
+        limiter.release()  # hands the slot to the waiter in the same tick as the timeout
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        await limiter.acquire()
+        monkeypatch.setattr(asyncio, "wait_for", admitted_then_timed_out)
+        return await limiter.acquire()
+
+    assert asyncio.run(scenario()) is None
+    assert limiter.inflight == 1
+    limiter.release()
+    assert limiter.inflight == 0 and limiter.queued() == 0
+
+
+def test_limit_backs_off_when_slow_and_grows_when_saturated():
+    limiter = AdaptiveLimiter(initial=10, min_limit=2, max_limit=20, target_ms=100)
+    limiter.inflight = 10
+    for _ in range(10):
+        limiter.inflight += 1
+        limiter.release(latency=0.01)
+    assert 10.5 < limiter.limit < 11.5
+    for _ in range(30):
+        limiter.inflight += 1
+        limiter.release(latency=1.0)
+    # One 10% cut per round of ~limit requests, not one per slow request.
+    assert 7 < limiter.limit < 9
+    backed_off = limiter.limit
+    limiter.inflight = 0
+    limiter.latency = None
+    for _ in range(50):
+        limiter.inflight += 1
+        limiter.release(latency=0.01)  # never saturated: no reason to grow
+    assert limiter.limit == backed_off
+
+
+def test_middleware_sheds_with_503_and_exempts_health():
+    gate = asyncio.Event()
+
+    async def slow(request):
+        await gate.wait()
+        return PlainTextResponse("done")
+
+    async def health(request):
+        return PlainTextResponse("ok")
+
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, queue_size=0)
+    app = AdmissionMiddleware(
+        Starlette(routes=[Route("/slow", slow), Route("/health", health)]), limiter=limiter
+    )
+    shed = admission.SHED.labels("queue_full")._value.get()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            first = asyncio.ensure_future(client.get("/slow"))
+            while limiter.inflight == 0:
+                await asyncio.sleep(0.001)
+            rejected = await client.get("/slow")
+            healthy = await client.get("/health")
+            gate.set()
+            return await first, rejected, healthy
+
+    first, rejected, healthy = asyncio.run(scenario())
+    assert first.status_code == 200 and healthy.status_code == 200
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "1"
+    assert admission.SHED.labels("queue_full")._value.get() == shed + 1
+    assert limiter.inflight == 0
+
+
+def test_exports_are_capped_apart_from_the_limit():
+    gate = asyncio.Event()
+
+    async def export(request):
+        async def body():
+            yield b"id,title\n"
+            await gate.wait()
+            yield b"1,a\n"
+
+        return StreamingResponse(body(), media_type="text/csv")
+
+    async def read(request):
+        return PlainTextResponse("ok")
+
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, queue_size=0)
+    app = AdmissionMiddleware(
+        Starlette(routes=[Route("/tasks/export", export), Route("/tasks/1", read)]),
+        limiter=limiter,
+        stream_limit=1,
+    )
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            first = asyncio.ensure_future(client.get("/tasks/export"))
+            while app.streams == 0:
+                await asyncio.sleep(0.001)
+            second = await client.get("/tasks/export")
+            # The open export holds no admission slot, so normal reads still get in.
+            reads = [await client.get("/tasks/1") for _ in range(3)]
+            gate.set()
+            return await first, second, reads
+
+    first, second, reads = asyncio.run(scenario())
+    assert first.status_code == 200 and first.text == "id,title\n1,a\n"
+    assert second.status_code == 503
+    assert [r.status_code for r in reads] == [200, 200, 200]
+    assert app.streams == 0 and limiter.inflight == 0
@@ -0,0 +1,24 @@
+from app.db import async_url
+
+
+def test_async_url_mapping():
+    assert async_url("sqlite:///./dev.db") == "sqlite+aiosqlite:///./dev.db"
+    assert async_url("postgresql://u:p@h:5432/db").startswith("postgresql+psycopg://u:p@")
+    assert async_url("postgresql+psycopg://u:p@h/db") == "postgresql+psycopg://u:p@h/db"
+
+
+def test_crud_over_async_session(async_test_client):
+    c = async_test_client
+    r = c.post("/tasks/", json={"title": "Async", "tag": "aio"})
+    assert r.status_code == 201, r.text
+    created = r.json()
+
+    assert c.get(f"/tasks/{created['id']}").json() == created
+    assert [t["id"] for t in c.get("/tasks/?tag=aio").json()] == [created["id"]]
+
+    r = c.put(f"/tasks/{created['id']}", json={"title": "Async 2", "tag": "aio"})
+    assert r.json()["title"] == "Async 2"
+    assert c.patch(f"/tasks/{created['id']}/complete").json()["completed"] is True
+
+    assert c.delete(f"/tasks/{created['id']}").status_code == 204
+    assert c.get(f"/tasks/{created['id']}").status_code == 404
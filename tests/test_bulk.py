@@ -0,0 +1,69 @@
+import json
+
+from app import crud
+
+
+def test_bulk_create_json_and_ndjson(test_client):
+    r = test_client.post(
+        "/tasks/bulk", json=[{"title": "B1", "tag": "bulk"}, {"tag": "no title"}, {"title": "B2"}]
+    )
+    assert r.status_code == 200, r.text
+    results = r.json()["results"]
+    assert [x["status"] for x in results] == [201, 422, 201]
+    assert results[0]["task"]["title"] == "B1"
+    assert results[2]["id"] > results[0]["id"]
+    assert "title" in results[1]["error"]
+
+    body = "\n".join(json.dumps({"title": f"N{i}", "tag": "ndjson"}) for i in range(3))
+    r = test_client.post(
+        "/tasks/bulk", content=body, headers={"content-type": "application/x-ndjson"}
+    )
+    assert [x["task"]["title"] for x in r.json()["results"]] == ["N0", "N1", "N2"]
+    assert len(test_client.get("/tasks/?tag=ndjson").json()) == 3
+
+
+def test_bulk_update_complete_delete(test_client):
+    created = test_client.post("/tasks/bulk", json=[{"title": "U1"}, {"title": "U2"}]).json()
+    a, b = (x["id"] for x in created["results"])
+
+    r = test_client.patch(
+        "/tasks/bulk",
+        json=[{"id": a, "tag": "patched"}, {"id": 999999, "title": "x"}, {"id": b, "title": None}],
+    )
+    results = r.json()["results"]
+    assert results[0]["status"] == 200
+    task = results[0]["task"]
+    assert task.pop("updated_at")
+    assert task == {
+        "id": a,
+        "title": "U1",
+        "description": None,
+        "tag": "patched",
+        "completed": False,
+        "version": 2,
+    }
+    assert [x["status"] for x in results[1:]] == [404, 422]
+
+    r = test_client.post("/tasks/bulk/complete", json=[a, 999999])
+    assert [x["status"] for x in r.json()["results"]] == [200, 404]
+    assert test_client.get(f"/tasks/{a}").json()["completed"] is True
+
+    r = test_client.post("/tasks/bulk/delete", json=[a, b, "nope"])
+    assert [x["status"] for x in r.json()["results"]] == [204, 204, 422]
+    assert test_client.get(f"/tasks/{b}").status_code == 404
+
+
+def test_bulk_rejects_bad_bodies(test_client, monkeypatch):
+    assert test_client.post("/tasks/bulk", content=b"{not json").status_code == 400
+    assert test_client.post("/tasks/bulk", json={"title": "x"}).status_code == 422
+
+    monkeypatch.setattr("app.bulk.BULK_MAX_ITEMS", 2)
+    assert test_client.post("/tasks/bulk/delete", json=[1, 2, 3]).status_code == 413
+
+
+def test_bulk_create_keeps_input_order_with_sorted_returning(session, monkeypatch):
+    # Off SQLite the rows come back through sort_by_parameter_order, not an id sort.
+    monkeypatch.setattr(crud, "dialect_of", lambda session: "postgresql")
+    titles = [f"order {i}" for i in range(5)]
+    created = crud.bulk_create(session, [{"title": t, "tag": "bulk-order"} for t in titles])
+    assert [t["title"] for t in created] == titles
@@ -0,0 +1,97 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+from app.cache import CACHE_REQUESTS, MemoryBackend, TaskCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def hits(kind):
+    return CACHE_REQUESTS.labels(kind, "hit")._value.get()
+
+
+def test_memory_backend_lru_and_ttl():
+    clock = Clock()
+    backend = MemoryBackend(max_entries=2, clock=clock)
+    run(backend.set("a", 1, ttl=10))
+    run(backend.set("b", 2, ttl=10))
+    assert run(backend.get("a")) == 1
+    run(backend.set("c", 3, ttl=10))
+    assert run(backend.get("b")) is None
+    assert len(backend) == 2
+
+    clock.now = 11
+    assert run(backend.get("a")) is None
+
+
+def test_populate_skipped_when_write_raced_the_read():
+    cache = TaskCache(MemoryBackend(10))
+    gen = run(cache.generation())
+    run(cache.invalidate([1]))
+    run(cache.set_task(1, {"id": 1}, gen))
+    assert run(cache.get_task(1)) is None
+
+    gen = run(cache.generation())
+    run(cache.set_task(1, {"id": 1}, gen))
+    assert run(cache.get_task(1)) == {"id": 1}
+
+
+def test_reads_served_from_cache_and_invalidated_by_writes(test_client):
+    c = test_client.post("/tasks/", json={"title": "Cached", "tag": "cache"}).json()
+
+    before = hits("task")
+    assert test_client.get(f"/tasks/{c['id']}").json() == c
+    assert test_client.get(f"/tasks/{c['id']}").json() == c
+    assert hits("task") == before + 1
+
+    before = hits("list")
+    test_client.get("/tasks/?tag=cache")
+    assert len(test_client.get("/tasks/?tag=cache").json()) == 1
+    assert hits("list") == before + 1
+
+    test_client.put(f"/tasks/{c['id']}", json={"title": "Changed", "tag": "cache"})
+    assert test_client.get(f"/tasks/{c['id']}").json()["title"] == "Changed"
+    assert test_client.get("/tasks/?tag=cache").json()[0]["title"] == "Changed"
+
+    test_client.post("/tasks/bulk/complete", json=[c["id"]])
+    assert test_client.get(f"/tasks/{c['id']}").json()["completed"] is True
+
+    test_client.post("/tasks/", json={"title": "Second", "tag": "cache"})
+    assert len(test_client.get("/tasks/?tag=cache").json()) == 2
+
+    test_client.delete(f"/tasks/{c['id']}")
+    assert test_client.get(f"/tasks/{c['id']}").status_code == 404
+
+
+def test_cache_can_be_disabled(test_client, monkeypatch):
+    monkeypatch.setattr("app.cache.task_cache.enabled", False)
+    c = test_client.post("/tasks/", json={"title": "Uncached"}).json()
+    before = hits("task")
+    test_client.get(f"/tasks/{c['id']}")
+    test_client.get(f"/tasks/{c['id']}")
+    assert hits("task") == before
+
+
+def test_memory_cache_is_off_by_default():
+    # Per-worker memory caches serve stale rows across workers, so it is opt-in.
+    out = subprocess.run(
+        [sys.executable, "-c", "import app.cache as c; print(c.task_cache.enabled)"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).resolve().parents[1],
+        env={"PATH": ""},
+    )
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,157 @@
+import asyncio
+
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from app import changes, crud
+from app.changes import ChangeFeed, event_stream
+from app.models import TaskChange
+
+
+def _runner(engine):
+    async def run(fn, *args):
+        def call():
+            with Session(engine) as session:
+                return fn(session, *args)
+
+        return await run_in_threadpool(call)
+
+    return run
+
+
+def test_triggers_log_every_write(engine):
+    with Session(engine) as session:
+        task = crud.create_task(session, {"title": "logged", "tag": "chg-a"})
+        crud.update_task(session, task["id"], {"tag": "chg-b"})
+        crud.complete_task(session, task["id"])
+        crud.delete_task(session, task["id"])
+        rows = session.exec(
+            select(TaskChange).where(TaskChange.task_id == task["id"]).order_by(TaskChange.id)
+        ).all()
+    assert [(r.op, r.tag, r.prev_tag, r.version) for r in rows] == [
+        ("created", "chg-a", None, 1),
+        ("updated", "chg-b", "chg-a", 2),
+        ("completed", "chg-b", None, 3),
+        ("deleted", "chg-b", None, 3),
+    ]
+
+
+def test_feed_fans_out_by_tag(engine, monkeypatch):
+    # No timed polls: only the after-commit nudge can wake this feed.
+    feed = ChangeFeed(runner=_runner(engine), poll_secs=60)
+    monkeypatch.setattr(changes, "change_feed", feed)
+
+    async def scenario():
+        watch_a, watch_b = feed.subscribe("feed-a"), feed.subscribe("feed-b")
+        everything = feed.subscribe()
+        await asyncio.sleep(0.1)  # let the feed record its starting id
+        task = await feed.runner(crud.create_task, {"title": "fan", "tag": "feed-a"})
+        await feed.runner(crud.update_task, task["id"], {"tag": "feed-b"})
+        got_a = [await asyncio.wait_for(watch_a.queue.get(), 2) for _ in range(2)]
+        got_b = await asyncio.wait_for(watch_b.queue.get(), 2)
+        got_all = [await asyncio.wait_for(everything.queue.get(), 2) for _ in range(2)]
+        await feed.stop()
+        return got_a, got_b, got_all, watch_b.queue.empty()
+
+    got_a, got_b, got_all, b_drained = asyncio.run(scenario())
+    # The feed-a watcher also sees the task leave its tag.
+    assert [(c["op"], c["tag"], c["prev_tag"]) for c in got_a] == [
+        ("created", "feed-a", None),
+        ("updated", "feed-b", "feed-a"),
+    ]
+    assert got_b["op"] == "updated" and b_drained
+    assert got_all == got_a
+
+
+def test_slow_client_is_disconnected(engine):
+    feed = ChangeFeed(runner=_runner(engine), client_buffer=1, poll_secs=0.05)
+    disconnects = changes.DISCONNECTS._value.get()
+
+    async def scenario():
+        slow = feed.subscribe("slow")
+        await asyncio.sleep(0.1)
+        await feed.runner(crud.bulk_create, [{"title": f"s{i}", "tag": "slow"} for i in range(3)])
+        end = await asyncio.wait_for(slow.queue.get(), 2)
+        await feed.stop()
+        return end, slow in feed.subscribers
+
+    end, subscribed = asyncio.run(scenario())
+    assert end is None and not subscribed
+    assert changes.DISCONNECTS._value.get() - disconnects == 1
+
+
+def test_feed_stops_when_the_last_subscriber_leaves(engine):
+    polls = []
+
+    async def runner(fn, *args):
+        polls.append(fn)
+        return await _runner(engine)(fn, *args)
+
+    feed = ChangeFeed(runner=runner, poll_secs=0.01)
+
+    async def scenario():
+        first, second = feed.subscribe(), feed.subscribe()
+        running = feed._task
+        await asyncio.sleep(0.05)
+        feed.unsubscribe(first)
+        assert not running.done()
+        feed.unsubscribe(second)
+        await asyncio.sleep(0.01)
+        idle_polls = len(polls)
+        await asyncio.sleep(0.05)
+        stopped = running.done() and len(polls) == idle_polls
+        feed.subscribe()
+        await asyncio.sleep(0.05)
+        restarted = feed._task is not None and not feed._task.done() and len(polls) > idle_polls
+        await feed.stop()
+        return stopped, restarted
+
+    assert asyncio.run(scenario()) == (True, True)
+
+
+def test_stream_replays_after_last_event_id(engine):
+    with Session(engine) as session:
+        start = changes.latest_id(session)
+        for i in range(3):
+            crud.create_task(session, {"title": f"replay {i}", "tag": "replay"})
+        crud.create_task(session, {"title": "other", "tag": "not-replayed"})
+        assert changes.backfill(session, start, "replay", limit=2) is None
+    feed = ChangeFeed(runner=_runner(engine), poll_secs=0.05)
+
+    async def read(after, frames):
+        stream = event_stream(feed, "replay", after)
+        try:
+            return [await stream.__anext__() for _ in range(frames)]
+        finally:
+            await stream.aclose()
+            await feed.stop()
+
+    frames = asyncio.run(read(start + 1, 3))
+    assert frames[0] == b"retry: %d\n\n" % changes.RETRY_MS
+    assert [f.split(b"\n")[:2] for f in frames[1:]] == [
+        [b"id: %d" % (start + i), b"event: created"] for i in (2, 3)
+    ]
+    assert b'"title"' not in frames[1] and b'"tag":"replay"' in frames[1]
+    assert not feed.subscribers
+
+    with Session(engine) as session:
+        changes.prune(session, keep=1)
+    frames = asyncio.run(read(start, 2))
+    assert frames[1] == b"event: reset\ndata: {}\n\n"
+
+
+def test_retention_runs_without_subscribers(engine):
+    runner = _runner(engine)
+
+    async def scenario():
+        retention = asyncio.ensure_future(changes.retention_loop(runner, keep=5, interval=0.01))
+        try:
+            for i in range(4):
+                await runner(crud.bulk_create, [{"title": f"r{i}-{j}"} for j in range(10)])
+                await asyncio.sleep(0.05)
+        finally:
+            retention.cancel()
+
+    asyncio.run(scenario())
+    with Session(engine) as session:
+        assert len(session.exec(select(TaskChange.id)).all()) <= 5
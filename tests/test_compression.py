@@ -0,0 +1,128 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("*", "br"),
+        ("*;q=0.1, br;q=0", "gzip"),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_negotiate(header, expected):
+    assert negotiate(header, ("br", "gzip")) == expected
+
+
+def test_negotiate_without_brotli():
+    assert negotiate("br, gzip;q=0.5", ("gzip",)) == "gzip"
+
+
+def _raw(client, path, encoding="gzip"):
+    """Response with its body left encoded (httpx would otherwise decode it)."""
+    with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as r:
+        return r, b"".join(r.iter_raw())
+
+
+def test_large_task_page_is_gzipped(test_client):
+    big = "x" * 2000
+    test_client.post("/tasks/bulk", json=[{"title": "z", "description": big, "tag": "gz"}] * 3)
+
+    r, raw = _raw(test_client, "/tasks/?tag=gz")
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert int(r.headers["content-length"]) == len(raw)
+    items = json.loads(gzip.decompress(raw))
+    assert [t["description"] for t in items] == [big] * 3
+    assert len(raw) < 0.1 * sum(len(t["description"]) for t in items)
+    assert compression.COMPRESSED.labels("gzip")._value.get() >= 1
+    assert compression.RATIO.labels("gzip")._sum.get() > 0
+
+    r, raw = _raw(test_client, "/tasks/?tag=gz", encoding="identity")
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert len(json.loads(raw)) == 3
+
+
+def test_compressed_task_keeps_a_usable_weak_etag(test_client):
+    c = test_client.post("/tasks/", json={"title": "big", "description": "y" * 1500}).json()
+    r, _ = _raw(test_client, f"/tasks/{c['id']}")
+    assert r.headers["content-encoding"] == "gzip"
+    assert (
+        r.headers["etag"]
+        == "W/"
+        + test_client.get(f"/tasks/{c['id']}", headers={"Accept-Encoding": "identity"}).headers[
+            "etag"
+        ]
+    )
+
+    headers = {"if-none-match": r.headers["etag"]}
+    assert test_client.get(f"/tasks/{c['id']}", headers=headers).status_code == 304
+    r = test_client.put(
+        f"/tasks/{c['id']}", json={"title": "edited"}, headers={"if-match": r.headers["etag"]}
+    )
+    assert r.status_code == 200
+
+
+def test_event_streams_are_not_compressed():
+    assert not compression.compressible("text/event-stream; charset=utf-8")
+    assert compression.compressible("text/csv")
+
+
+def test_small_and_encoded_responses_are_left_alone(test_client):
+    before = compression.SKIPPED.labels("small")._value.get()
+    r, raw = _raw(test_client, "/health")
+    assert "content-encoding" not in r.headers
+    assert json.loads(raw) == {"status": "ok"}
+    assert compression.SKIPPED.labels("small")._value.get() == before + 1
+
+    test_client.post("/tasks/bulk", json=[{"title": "e", "tag": "gz-export"}] * 50)
+    r, raw = _raw(test_client, "/tasks/export?tag=gz-export&gzip=true")
+    assert r.headers["content-encoding"] == "gzip"
+    # Compressed once by the endpoint, not again by the middleware.
+    assert len(gzip.decompress(raw).splitlines()) == 50
+
+
+def test_streamed_export_is_compressed_per_chunk(test_client, monkeypatch):
+    monkeypatch.setattr("app.export.EXPORT_BATCH_SIZE", 10)
+    test_client.post("/tasks/bulk", json=[{"title": "s", "tag": "gz-stream"}] * 35)
+
+    r, raw = _raw(test_client, "/tasks/export?tag=gz-stream")
+    assert r.headers["content-encoding"] == "gzip"
+    assert "content-length" not in r.headers
+    rows = [json.loads(line) for line in gzip.decompress(raw).splitlines()]
+    assert len(rows) == 35
+
+
+def test_streamed_chunks_are_flushed():
+    async def body():
+        for i in range(3):
+            yield f'{{"event": {i}}}\n'.encode() * 100
+
+    inner = FastAPI()
+    inner.get("/s")(lambda: StreamingResponse(body(), media_type="application/x-ndjson"))
+    inner.get("/png")(lambda: PlainTextResponse("p" * 5000, media_type="image/png"))
+    client = TestClient(CompressionMiddleware(inner, encodings=("gzip",)))
+
+    with client.stream("GET", "/s", headers={"Accept-Encoding": "gzip"}) as r:
+        chunks = list(r.iter_raw())
+    # Each chunk is a complete sync-flushed block: its prefix decompresses on its own.
+    d = zlib.decompressobj(31)
+    assert d.decompress(chunks[0]).startswith(b'{"event": 0}')
+
+    r, raw = _raw(client, "/png")
+    assert "content-encoding" not in r.headers
+    assert len(raw) == 5000
@@ -0,0 +1,145 @@
+from argparse import Namespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlmodel import Session
+
+from alembic import command
+from alembic.config import Config
+from app import migrate_on_startup as mos
+from app.conditional import list_etag, task_etag
+from app.main import app, get_session
+
+
+def test_task_etag_and_not_modified(test_client):
+    c = test_client.post("/tasks/", json={"title": "Etag me"}).json()
+    assert c["version"] == 1
+
+    r = test_client.get(f"/tasks/{c['id']}")
+    etag, last_modified = r.headers["etag"], r.headers["last-modified"]
+    assert etag == task_etag(c["id"], 1, c["updated_at"])
+
+    r = test_client.get(f"/tasks/{c['id']}", headers={"if-none-match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+
+    r = test_client.get(f"/tasks/{c['id']}", headers={"if-modified-since": last_modified})
+    assert r.status_code == 304
+
+    test_client.patch(f"/tasks/{c['id']}/complete")
+    r = test_client.get(f"/tasks/{c['id']}", headers={"if-none-match": etag})
+    assert r.status_code == 200
+    assert r.json()["version"] == 2
+    assert r.headers["etag"] == task_etag(c["id"], 2, r.json()["updated_at"])
+
+
+def test_conditional_get_bypassing_cache(test_client, monkeypatch):
+    monkeypatch.setattr("app.cache.task_cache.enabled", False)
+    c = test_client.post("/tasks/", json={"title": "No cache", "tag": "etag-nc"}).json()
+    etag = task_etag(c["id"], 1, c["updated_at"])
+    assert test_client.get(f"/tasks/{c['id']}", headers={"if-none-match": etag}).status_code == 304
+    assert test_client.get("/tasks/999999", headers={"if-none-match": etag}).status_code == 404
+
+    r = test_client.get("/tasks/?tag=etag-nc")
+    assert r.headers["etag"] == list_etag([(c["id"], 1, c["updated_at"])])
+    r = test_client.get("/tasks/?tag=etag-nc", headers={"if-none-match": r.headers["etag"]})
+    assert r.status_code == 304
+
+
+def test_list_etag_changes_with_page(test_client):
+    test_client.post("/tasks/", json={"title": "L1", "tag": "etag-list"})
+    r = test_client.get("/tasks/?tag=etag-list")
+    etag = r.headers["etag"]
+    assert "last-modified" not in r.headers
+    assert (
+        test_client.get(
+            "/tasks/?tag=etag-list", headers={"if-none-match": f'W/"x", {etag}'}
+        ).status_code
+        == 304
+    )
+
+    test_client.post("/tasks/", json={"title": "L2", "tag": "etag-list"})
+    r = test_client.get("/tasks/?tag=etag-list", headers={"if-none-match": etag})
+    assert r.status_code == 200
+    assert len(r.json()) == 2
+
+
+def test_if_match_on_update(test_client):
+    c = test_client.post("/tasks/", json={"title": "Concurrent"}).json()
+    url = f"/tasks/{c['id']}"
+
+    first = task_etag(c["id"], 1, c["updated_at"])
+    r = test_client.put(url, json={"title": "First"}, headers={"if-match": first})
+    assert r.status_code == 200
+    assert r.headers["etag"] == task_etag(c["id"], 2, r.json()["updated_at"])
+
+    r = test_client.put(url, json={"title": "Lost"}, headers={"if-match": first})
+    assert r.status_code == 412
+    assert test_client.get(url).json()["title"] == "First"
+
+    assert test_client.put(url, json={"title": "Any"}, headers={"if-match": "*"}).status_code == 200
+
+
+def test_writes_return_validators_for_chaining_if_match(test_client):
+    r = test_client.post("/tasks/", json={"title": "Chain"})
+    c = r.json()
+    assert r.headers["etag"] == task_etag(c["id"], 1, c["updated_at"])
+    assert "last-modified" in r.headers
+
+    url = f"/tasks/{c['id']}"
+    r = test_client.patch(f"{url}/complete")
+    assert r.headers["etag"] == task_etag(c["id"], 2, r.json()["updated_at"])
+    r = test_client.put(url, json={"title": "Chained"}, headers={"if-match": r.headers["etag"]})
+    assert r.status_code == 200
+
+
+def test_validators_differ_when_sqlite_reuses_an_id(test_client):
+    # SQLite gives the highest id out again once that row is deleted.
+    old = test_client.post("/tasks/", json={"title": "Old", "tag": "etag-reuse"}).json()
+    etag = test_client.get(f"/tasks/{old['id']}").headers["etag"]
+    assert test_client.delete(f"/tasks/{old['id']}").status_code == 204
+    r = test_client.post("/tasks/bulk", json=[{"title": "New", "tag": "etag-reuse"}])
+    new = r.json()["results"][0]["task"]
+    assert (new["id"], new["version"]) == (old["id"], 1)
+
+    url = f"/tasks/{new['id']}"
+    assert test_client.get(url, headers={"if-none-match": etag}).status_code == 200
+    r = test_client.put(url, json={"title": "Clobbered"}, headers={"if-match": etag})
+    assert r.status_code == 412
+    assert test_client.get(url).json()["title"] == "New"
+
+
+def test_list_ignores_if_modified_since(test_client):
+    a = test_client.post("/tasks/", json={"title": "A", "tag": "etag-ims"}).json()
+    b = test_client.post("/tasks/", json={"title": "B", "tag": "etag-ims"}).json()
+    # The newest row on the page is untouched by the delete.
+    since = test_client.get(f"/tasks/{b['id']}").headers["last-modified"]
+    assert test_client.delete(f"/tasks/{a['id']}").status_code == 204
+
+    r = test_client.get("/tasks/?tag=etag-ims", headers={"if-modified-since": since})
+    assert r.status_code == 200 and [t["title"] for t in r.json()] == ["B"]
+
+
+def test_if_match_on_a_row_from_before_the_version_migration(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'premigration.db'}"
+    cfg = Config(str(mos.PROJECT_ROOT / "alembic.ini"), cmd_opts=Namespace(x=[f"DB_URL={url}"]))
+    cfg.set_main_option("script_location", str(mos.PROJECT_ROOT / "alembic"))
+    cfg.attributes["configure_logger"] = False
+    command.upgrade(cfg, "8c1e2f4a9b7d")
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO task (title, completed) VALUES ('legacy', 0)")
+    command.upgrade(cfg, "head")
+
+    def _session():
+        with Session(engine) as s:
+            yield s
+
+    monkeypatch.setattr("app.cache.task_cache.enabled", False)
+    monkeypatch.setitem(app.dependency_overrides, get_session, _session)
+    client = TestClient(app)
+    etag = client.get("/tasks/1").headers["etag"]
+    r = client.put("/tasks/1", json={"title": "edited"}, headers={"if-match": etag})
+    assert r.status_code == 200, r.text
+    engine.dispose()
@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.observability.db_timing import N_PLUS_ONE, DBTimingMiddleware, QueryStats
+
+
+def test_server_timing_and_access_log_fields(test_client, caplog):
+    test_client.post("/tasks/", json={"title": "timed", "tag": "db-timing"})
+    with caplog.at_level("INFO", logger="app"):
+        r = test_client.get("/tasks/", params={"tag": "db-timing"})
+    assert r.headers["server-timing"].startswith("db;dur=")
+    assert 'desc="1 queries"' in r.headers["server-timing"]
+    rec = next(r for r in caplog.records if r.getMessage() == "request")
+    assert rec.db_queries == 1
+    assert rec.db_ms >= 0
+    assert not hasattr(rec, "n_plus_one")
+
+    r = test_client.get("/health")
+    assert "server-timing" not in r.headers
+
+
+def test_repeated_statement_flagged_as_n_plus_one(engine, caplog):
+    def lookups():
+        with engine.connect() as conn:
+            for i in range(12):
+                conn.execute(text("SELECT :i"), {"i": i})
+
+    async def endpoint(request):
+        await run_in_threadpool(lookups)
+        return PlainTextResponse("ok")
+
+    app = DBTimingMiddleware(Starlette(routes=[Route("/", endpoint)]))
+    before = N_PLUS_ONE._value.get()
+    with caplog.at_level("WARNING", logger="app.observability.db_timing"):
+        r = TestClient(app).get("/")
+    assert 'desc="12 queries"' in r.headers["server-timing"]
+    assert N_PLUS_ONE._value.get() - before == 1
+    assert "ran 12 times" in caplog.text
+
+
+def test_repeated_statement_threshold():
+    stats = QueryStats()
+    stats.queries = 9
+    stats.statements.update({"SELECT a": 5, "SELECT b": 4})
+    assert stats.repeated_statement(threshold=5) == ("SELECT a", 5)
+    assert stats.repeated_statement(threshold=6) is None
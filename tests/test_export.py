@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+
+
+def _seed(client, tag):
+    client.post("/tasks/bulk", json=[{"title": f"E{i}", "tag": tag} for i in range(5)])
+    t = client.get(f"/tasks/?tag={tag}").json()[0]
+    client.patch(f"/tasks/{t['id']}/complete")
+
+
+def test_export_ndjson_with_filters(test_client, monkeypatch):
+    monkeypatch.setattr("app.export.EXPORT_BATCH_SIZE", 2)
+    _seed(test_client, "export-nd")
+
+    r = test_client.get("/tasks/export?tag=export-nd")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["title"] for row in rows] == [f"E{i}" for i in range(5)]
+
+    r = test_client.get("/tasks/export?tag=export-nd&completed=false")
+    assert len(r.text.splitlines()) == 4
+
+
+def test_export_csv_gzip(test_client):
+    _seed(test_client, "export-csv")
+
+    r = test_client.get("/tasks/export?format=csv&tag=export-csv&gzip=true")
+    assert r.headers["content-encoding"] == "gzip"
+    # httpx transparently decodes Content-Encoding: gzip
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(rows) == 5
+    assert rows[0]["completed"] == "True"
+    assert set(rows[0]) == {
+        "id",
+        "title",
+        "description",
+        "tag",
+        "completed",
+        "version",
+        "updated_at",
+    }
+
+
+def test_export_route_not_shadowed_by_task_id(test_client):
+    assert test_client.get("/tasks/export?format=xml").status_code == 422
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import group_commit
+from app.group_commit import WriteCoalescer
+
+
+def _runner(engine):
+    async def run(fn, *args):
+        def call():
+            with Session(engine) as session:
+                return fn(session, *args)
+
+        return await run_in_threadpool(call)
+
+    return run
+
+
+def test_concurrent_writes_share_one_commit(engine):
+    commits = []
+
+    def _commit(conn):
+        commits.append(conn)
+
+    event.listen(engine, "commit", _commit)
+    coalescer = WriteCoalescer(max_batch=100, max_wait_ms=50, runner=_runner(engine))
+    size_before = group_commit.BATCH_SIZE._sum.get()
+
+    async def burst():
+        created = await asyncio.gather(
+            *(coalescer.create({"title": f"gc{i}", "tag": "gc"}) for i in range(10))
+        )
+        done = await asyncio.gather(
+            coalescer.complete(created[0]["id"]),
+            coalescer.complete(created[1]["id"]),
+            coalescer.complete(10**9),
+        )
+        return created, done
+
+    try:
+        created, done = asyncio.run(burst())
+    finally:
+        event.remove(engine, "commit", _commit)
+    assert [t["title"] for t in created] == [f"gc{i}" for i in range(10)]
+    assert len({t["id"] for t in created}) == 10
+    assert [d["completed"] for d in done[:2]] == [True, True]
+    assert done[2] is None
+    assert len(commits) == 2
+    assert group_commit.BATCH_SIZE._sum.get() - size_before == 13
+
+
+def test_failed_batch_is_replayed_one_by_one(engine):
+    coalescer = WriteCoalescer(max_batch=3, max_wait_ms=1000, runner=_runner(engine))
+    fallbacks = group_commit.FALLBACKS._value.get()
+
+    async def burst():
+        return await asyncio.gather(
+            coalescer.create({"title": "ok-1"}),
+            coalescer.create({"title": None}),  # NOT NULL violation
+            coalescer.create({"title": "ok-2"}),
+            return_exceptions=True,
+        )
+
+    ok1, bad, ok2 = asyncio.run(burst())
+    assert (ok1["title"], ok2["title"]) == ("ok-1", "ok-2")
+    assert isinstance(bad, IntegrityError)
+    assert group_commit.FALLBACKS._value.get() == fallbacks + 1
+
+
+@pytest.fixture
+def coalesced(test_client, engine, monkeypatch):
+    coalescer = WriteCoalescer(max_wait_ms=1, runner=_runner(engine))
+    monkeypatch.setattr(group_commit, "write_coalescer", coalescer)
+    return test_client
+
+
+def test_endpoints_use_the_coalescer(coalesced):
+    r = coalesced.post("/tasks/", json={"title": "via batch", "tag": "gc-http"})
+    assert r.status_code == 201
+    task_id = r.json()["id"]
+    r = coalesced.patch(f"/tasks/{task_id}/complete")
+    assert r.status_code == 200 and r.json()["completed"] is True
+    assert coalesced.patch(f"/tasks/{10**9}/complete").status_code == 404
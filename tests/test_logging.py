@@ -0,0 +1,65 @@
+import io
+import json
+import logging
+import queue
+
+from app.json_logging import LOG_DROPPED, BatchingListener, DroppingQueueHandler, JsonFormatter
+
+
+def _record(status_code=None, msg="request", args=None):
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, msg, args, None)
+    if status_code is not None:
+        record.status_code = status_code
+    return record
+
+
+def _dropped(reason: str) -> float:
+    return LOG_DROPPED.labels(reason)._value.get()
+
+
+def test_listener_formats_once_and_batches_writes():
+    class Stream(io.StringIO):
+        writes = 0
+
+        def write(self, s):
+            Stream.writes += 1
+            return super().write(s)
+
+    q = queue.Queue(maxsize=100)
+    stream = Stream()
+    handler = DroppingQueueHandler(q)
+    for i in range(5):
+        handler.emit(_record(200, msg="hit %d", args=(i,)))
+    listener = BatchingListener(q, JsonFormatter(), stream=stream, batch_size=100)
+    listener.start()
+    listener.stop()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["message"] for line in lines] == [f"hit {i}" for i in range(5)]
+    assert lines[0]["status_code"] == 200
+    assert Stream.writes == 1
+
+
+def test_full_queue_drops_instead_of_blocking():
+    q = queue.Queue(maxsize=2)
+    handler = DroppingQueueHandler(q)
+    before = _dropped("queue_full")
+    for _ in range(5):
+        handler.emit(_record())
+    assert q.qsize() == 2
+    assert _dropped("queue_full") - before == 3
+
+
+def test_sampling_only_drops_successes_when_busy():
+    q = queue.Queue(maxsize=10)
+    handler = DroppingQueueHandler(q, sample_rate=0.0, sample_fraction=0.5, rand=lambda: 0.5)
+    before = _dropped("sampled")
+    for _ in range(5):
+        handler.emit(_record(200))
+    assert q.qsize() == 5  # below the threshold everything is kept
+
+    handler.emit(_record(200))
+    handler.emit(_record(503))
+    handler.emit(_record())
+    assert q.qsize() == 7  # the 503 and the non-request record survive
+    assert _dropped("sampled") - before == 1
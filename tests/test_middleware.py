@@ -0,0 +1,41 @@
+def test_request_id_generated_and_echoed(test_client):
+    r = test_client.get("/health")
+    assert len(r.headers["x-request-id"]) == 36
+
+    r = test_client.get("/health", headers={"x-request-id": "abc-123"})
+    assert r.headers["x-request-id"] == "abc-123"
+
+
+def test_access_log_record(test_client, caplog):
+    with caplog.at_level("INFO", logger="app"):
+        test_client.get("/tasks/999999", headers={"x-request-id": "log-1"})
+    rec = next(r for r in caplog.records if r.getMessage() == "request")
+    assert (rec.request_id, rec.path, rec.method, rec.status_code) == (
+        "log-1",
+        "/tasks/999999",
+        "GET",
+        404,
+    )
+
+
+def test_security_headers_and_docs_csp(test_client):
+    r = test_client.get("/health")
+    assert r.headers["x-frame-options"] == "DENY"
+    assert "cdn.jsdelivr.net" not in r.headers["content-security-policy"]
+
+    r = test_client.get("/docs")
+    assert "https://cdn.jsdelivr.net" in r.headers["content-security-policy"]
+
+
+def test_body_size_limit(test_client, monkeypatch):
+    monkeypatch.setattr("app.middleware_limits.MAX_BYTES", 10)
+    r = test_client.post("/tasks/", json={"title": "far too large a body"})
+    assert r.status_code == 413
+    assert r.json() == {"detail": "Request too large"}
+    assert "x-request-id" in r.headers
+
+
+def test_rate_limit(test_client, monkeypatch):
+    monkeypatch.setattr("app.middleware_limits.MAX_REQS", 0)
+    r = test_client.get("/health")
+    assert r.status_code == 429
@@ -0,0 +1,131 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware_limits import RateLimitMiddleware
+from app.ratelimit import MemoryStore, RedisStore, sliding_window
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_sliding_window_weights_previous_window():
+    # 30s into a 60s window: half of the previous window's 10 hits still count.
+    r = sliding_window(prev=10, cur=4, now=30, window=60, limit=10)
+    assert (r.allowed, r.remaining, r.reset) == (True, 0, 30)
+    r = sliding_window(prev=10, cur=5, now=30, window=60, limit=10)
+    assert not r.allowed
+    assert r.retry_after == 6  # prev weight must fall to 0.4
+
+
+def test_memory_store_limits_and_recovers():
+    clock = Clock(0.0)
+    store = MemoryStore(clock=clock)
+    assert [run(store.hit("a", 3, 10)).allowed for _ in range(4)] == [True, True, True, False]
+    assert run(store.hit("b", 3, 10)).allowed
+    clock.now = 25.0
+    assert run(store.hit("a", 3, 10)).allowed
+
+
+def test_memory_store_evicts_idle_and_bounds_keys():
+    clock = Clock(0.0)
+    store = MemoryStore(max_keys=3, clock=clock)
+    for i in range(5):
+        run(store.hit(f"ip{i}", 10, 10))
+    assert len(store) == 3
+
+    clock.now = 30.0
+    run(store.hit("fresh", 10, 10))
+    assert len(store) == 1
+
+
+class FakeRedis:
+    """In-memory stand-in for the slice of redis.asyncio the store uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.fail = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def decr(self, key):
+        self.data[key] = self.data.get(key, 0) - 1
+        return self.data[key]
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def incr(self, key):
+        self.ops.append(("incr", key))
+
+    def expire(self, key, secs):
+        self.ops.append(("expire", key))
+
+    def get(self, key):
+        self.ops.append(("get", key))
+
+    async def execute(self):
+        if self.redis.fail:
+            raise ConnectionError("redis down")
+        out = []
+        for op, key in self.ops:
+            if op == "incr":
+                self.redis.data[key] = self.redis.data.get(key, 0) + 1
+                out.append(self.redis.data[key])
+            elif op == "expire":
+                out.append(True)
+            else:
+                value = self.redis.data.get(key)
+                out.append(None if value is None else str(value).encode())
+        return out
+
+
+def test_redis_store_shared_between_workers():
+    redis, clock = FakeRedis(), Clock(5.0)
+    worker_a = RedisStore(redis, clock=clock)
+    worker_b = RedisStore(redis, clock=clock)
+    assert run(worker_a.hit("ip", 2, 60)).allowed
+    assert run(worker_b.hit("ip", 2, 60)).allowed
+    denied = run(worker_a.hit("ip", 2, 60))
+    assert not denied.allowed and denied.retry_after > 0
+    assert redis.data["rl:ip:0"] == 2
+
+    redis.fail = True
+    assert run(worker_b.hit("ip", 2, 60)).allowed
+
+
+def test_middleware_sets_ratelimit_headers(monkeypatch):
+    monkeypatch.setattr("app.middleware_limits.MAX_REQS", 2)
+    inner = Starlette(routes=[Route("/", lambda request: PlainTextResponse("ok"))])
+    client = TestClient(RateLimitMiddleware(inner, store=MemoryStore()))
+
+    r = client.get("/")
+    assert r.status_code == 200
+    assert (r.headers["ratelimit-limit"], r.headers["ratelimit-remaining"]) == ("2", "1")
+    client.get("/")
+    r = client.get("/")
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) >= 1
+    assert r.headers["ratelimit-remaining"] == "0"
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import insert
+from sqlmodel import SQLModel, create_engine
+
+import app.replicas as replicas
+from app.models import Task
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Task), [{"title": "only on the replica", "tag": "replica-only"}])
+    clock = Clock()
+    pool = replicas.ReplicaPool(
+        [engine], read_after_write=5, retry_secs=30, clock=clock, wall_clock=clock
+    )
+    monkeypatch.setattr(replicas, "replica_pool", pool)
+    return pool, clock
+
+
+def _titles(client, tag, **params):
+    return [t["title"] for t in client.get("/tasks/", params={"tag": tag, **params}).json()]
+
+
+def test_reads_go_to_replica_until_the_client_writes(test_client, replica):
+    pool, clock = replica
+    assert _titles(test_client, "replica-only") == ["only on the replica"]
+
+    test_client.post("/tasks/", json={"title": "on the primary", "tag": "replica-raw"})
+    # Read-after-write: the cookie keeps this client's reads on the primary for the window.
+    assert _titles(test_client, "replica-raw") == ["on the primary"]
+    assert _titles(test_client, "replica-only") == []
+
+    # The pin is the client's, not the address's: another client still reads the replica.
+    cookie = test_client.cookies.pop(replicas.PIN_COOKIE)
+    assert _titles(test_client, "replica-only", page_size=7) == ["only on the replica"]
+    until, _, sig = cookie.partition(".")
+    test_client.cookies.set(replicas.PIN_COOKIE, f"{int(until) + 3600}.{sig}")
+    assert _titles(test_client, "replica-only", page_size=8) == ["only on the replica"]
+    test_client.cookies.set(replicas.PIN_COOKIE, cookie)
+
+    clock.now += 6
+    # Another page size, so the read cache from the primary read is not hit.
+    assert _titles(test_client, "replica-raw", page_size=10) == []
+
+
+def test_failed_replica_falls_back_to_primary(test_client, replica):
+    pool, clock = replica
+    (engine,) = pool.engines
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE task")
+
+    test_client.post("/tasks/", json={"title": "still readable", "tag": "replica-gone"})
+    test_client.cookies.clear()
+    # The request that finds the replica broken is answered from the primary.
+    assert _titles(test_client, "replica-gone") == ["still readable"]
+    assert pool.pick() is None
+
+    pool.mark_up(engine)
+    r = test_client.get("/tasks/export", params={"tag": "replica-gone"})
+    assert [row["title"] for row in map(json.loads, r.text.splitlines())] == ["still readable"]
+    assert pool.pick() is None
+
+    clock.now += 31
+    assert pool.pick() is engine
+
+
+def test_round_robin_and_health_check(tmp_path):
+    good = create_engine(f"sqlite:///{tmp_path / 'a.db'}")
+    bad = create_engine(f"sqlite:///{tmp_path / 'missing' / 'b.db'}")
+    pool = replicas.ReplicaPool([good, bad], clock=Clock())
+    assert [pool.pick(), pool.pick()] == [good, bad]
+
+    asyncio.run(pool.check())
+    assert [pool.pick(), pool.pick()] == [good, good]
@@ -0,0 +1,40 @@
+from app.search import tokens
+
+
+def test_tokens_strip_query_syntax():
+    assert tokens('Foo "bar" OR baz*') == ["foo", "bar", "or", "baz"]
+    assert tokens("%%") == []
+
+
+def test_search_prefix_ranked_and_kept_in_sync(test_client):
+    a = test_client.post(
+        "/tasks/", json={"title": "Quarterly zebrafish report", "tag": "fts"}
+    ).json()
+    b = test_client.post(
+        "/tasks/",
+        json={"title": "zebrafish", "description": "zebrafish zebrafish tank", "tag": "fts"},
+    ).json()
+    test_client.post("/tasks/", json={"title": "Unrelated", "tag": "fts"})
+
+    r = test_client.get("/tasks/?search=zebraf")
+    assert [t["id"] for t in r.json()] == [b["id"], a["id"]]
+
+    r = test_client.get("/tasks/?search=zebrafish quarter")
+    assert [t["id"] for t in r.json()] == [a["id"]]
+
+    test_client.put(f"/tasks/{a['id']}", json={"title": "Annual report", "tag": "fts"})
+    test_client.delete(f"/tasks/{b['id']}")
+    assert test_client.get("/tasks/?search=zebrafish").json() == []
+    assert [t["id"] for t in test_client.get("/tasks/?search=annual").json()] == [a["id"]]
+
+    r = test_client.get("/tasks/export?search=annual")
+    assert len(r.text.splitlines()) == 1
+
+    assert test_client.get("/tasks/?search=annual&cursor=").status_code == 400
+
+
+def test_like_backend_fallback(test_client, monkeypatch):
+    monkeypatch.setattr("app.search.SEARCH_BACKEND", "like")
+    test_client.post("/tasks/", json={"title": "Substring hippopotamus", "tag": "like"})
+    r = test_client.get("/tasks/?search=popotam")
+    assert [t["title"] for t in r.json()] == ["Substring hippopotamus"]
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import httpx
+from sqlmodel import Session
+
+from app import crud, singleflight
+from app.main import app, get_session
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    flights = SingleFlight()
+    calls = []
+    counted = singleflight.FLIGHTS.labels("list", "coalesced")._value.get()
+    led = singleflight.FLIGHTS.labels("list", "leader")._value.get()
+
+    async def query(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return {"rows": value}
+
+    async def scenario():
+        same = [flights.do("list", "k", lambda: query("a")) for _ in range(5)]
+        other = flights.do("list", "other", lambda: query("b"))
+        results = await asyncio.gather(*same, other)
+        # A finished flight is not reused.
+        again = await flights.do("list", "k", lambda: query("c"))
+        return results, again
+
+    results, again = asyncio.run(scenario())
+    assert calls == ["a", "b", "c"]
+    assert all(r is results[0] for r in results[:5]) and results[5] == {"rows": "b"}
+    assert again == {"rows": "c"} and len(flights) == 0
+    assert singleflight.FLIGHTS.labels("list", "coalesced")._value.get() - counted == 4
+    assert singleflight.FLIGHTS.labels("list", "leader")._value.get() - led == 3
+
+
+def test_errors_forget_and_cancelled_callers():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db down")
+
+    async def slow(value):
+        await asyncio.sleep(0.05)
+        return value
+
+    async def scenario():
+        errors = await asyncio.gather(
+            *(flights.do("task", 1, fail) for _ in range(3)), return_exceptions=True
+        )
+        leader = asyncio.ensure_future(flights.do("task", 2, lambda: slow("before")))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("task", 2, lambda: slow("unused")))
+        await asyncio.sleep(0)
+        flights.forget()  # a write: later callers must not join the flight in progress
+        after_write = asyncio.ensure_future(flights.do("task", 2, lambda: slow("after")))
+        leader.cancel()
+        return errors, await follower, await after_write
+
+    errors, follower, after_write = asyncio.run(scenario())
+    assert [type(e) for e in errors] == [RuntimeError] * 3
+    assert (follower, after_write) == ("before", "after")
+
+
+def test_thundering_herd_runs_one_list_query(engine, monkeypatch):
+    queries = []
+    list_tasks = crud.list_tasks
+
+    def slow_list(session, *args, **kwargs):
+        queries.append(kwargs["tag"])
+        time.sleep(0.05)
+        return list_tasks(session, *args, **kwargs)
+
+    with Session(engine) as s:
+        crud.create_task(s, {"title": "herd", "tag": "herd"})
+    monkeypatch.setattr(crud, "list_tasks", slow_list)
+
+    def _session():
+        with Session(engine) as s:
+            yield s
+
+    async def herd():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return await asyncio.gather(*(client.get("/tasks/?tag=herd") for _ in range(20)))
+
+    app.dependency_overrides[get_session] = _session
+    try:
+        responses = asyncio.run(herd())
+    finally:
+        app.dependency_overrides.clear()
+    assert {r.status_code for r in responses} == {200}
+    assert {r.content for r in responses} == {responses[0].content}
+    assert queries == ["herd"]
+
+
+def test_flight_runs_on_its_own_session(engine):
+    # The leader's request session may be closed while joined requests still wait,
+    # so the shared query must not touch it.
+    class ClosedSession(Session):
+        def get_bind(self, *args, **kwargs):
+            raise AssertionError("request session used by a shared read")
+
+    with Session(engine) as s:
+        task = crud.create_task(s, {"title": "own session", "tag": "own-session"})
+
+    def _session():
+        with ClosedSession(engine) as s:
+            yield s
+
+    async def reads():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            return await asyncio.gather(
+                client.get("/tasks/?tag=own-session"), client.get(f"/tasks/{task['id']}")
+            )
+
+    app.dependency_overrides[get_session] = _session
+    try:
+        listed, fetched = asyncio.run(reads())
+    finally:
+        app.dependency_overrides.clear()
+    assert [t["id"] for t in listed.json()] == [task["id"]]
+    assert fetched.json()["title"] == "own session"
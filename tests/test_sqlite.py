@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+from sqlalchemy import event, text, update
+from sqlmodel import SQLModel, create_engine, select
+
+from app import crud
+from app.db import engine_kwargs
+from app.models import Task
+from app.sqlite import RoutingSession, apply_pragmas, is_file_url, writer_for
+
+
+@pytest.fixture
+def sqlite_mode(tmp_path):
+    url = f"sqlite:///{tmp_path / 'mode.db'}"
+    reader = create_engine(url, **engine_kwargs(url))
+    apply_pragmas(reader)
+    writer = writer_for(url, engine_kwargs(url))
+    SQLModel.metadata.create_all(writer)
+    yield reader, writer
+    reader.dispose()
+    writer.dispose()
+
+
+def test_is_file_url():
+    assert is_file_url("sqlite:///./dev.db")
+    assert not is_file_url("sqlite://")
+    assert not is_file_url("sqlite:///:memory:")
+    assert not is_file_url("postgresql+psycopg://u:p@h/db")
+
+
+def test_pragmas_applied(sqlite_mode):
+    reader, _ = sqlite_mode
+    with reader.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+
+def test_reads_use_readers_until_the_first_write(sqlite_mode):
+    reader, writer = sqlite_mode
+    used = []
+    for name, engine in (("reader", reader), ("writer", writer)):
+        event.listen(engine, "before_cursor_execute", lambda *a, name=name: used.append(name))
+
+    with RoutingSession(reader, writer) as session:
+        session.exec(select(Task.id)).all()
+        session.exec(update(Task).where(Task.id == -1).values(title="x"))
+        session.exec(select(Task.id)).all()
+        session.commit()
+        session.exec(select(Task.id)).all()
+    # The read after the UPDATE sees its transaction (BEGIN IMMEDIATE, UPDATE, SELECT on
+    # the writer); after the commit reads are back on a reader.
+    assert used == ["reader", "writer", "writer", "writer", "reader"]
+
+
+def test_concurrent_writes_do_not_lock(sqlite_mode):
+    reader, writer = sqlite_mode
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(20):
+                with RoutingSession(reader, writer) as s:
+                    task = crud.create_task(s, {"title": f"c{n}.{i}", "tag": "conc"})
+                with RoutingSession(reader, writer) as s:
+                    crud.update_task(s, task["id"], {"title": "done"})
+                    crud.list_tasks(s, tag="conc", limit=10)
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    with reader.connect() as conn:
+        done = conn.execute(text("SELECT count(*) FROM task WHERE title = 'done'")).scalar()
+    assert done == 160
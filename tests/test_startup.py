@@ -0,0 +1,77 @@
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event
+
+from app import migrate_on_startup as mos
+
+# What importing the app costs beyond FastAPI, pydantic and SQLAlchemy, which every
+# worker needs anyway (about 40 ms here). Loose enough for slow CI machines, tight
+# enough to catch a heavy dependency or module-level work creeping into app.main.
+APP_IMPORT_BUDGET_SECS = 0.5
+FRAMEWORK = "fastapi, sqlmodel, sqlalchemy.ext.asyncio, prometheus_fastapi_instrumentator"
+DEFERRED = ("alembic", "argparse")
+
+
+@pytest.fixture
+def fresh_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(mos, "_at_head", False)
+    monkeypatch.setenv("RUN_MIGRATIONS", "1")
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_head_revisions_match_alembic():
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    cfg = Config(str(mos.PROJECT_ROOT / "alembic.ini"))
+    cfg.set_main_option("script_location", str(mos.PROJECT_ROOT / "alembic"))
+    assert mos.head_revisions() == frozenset(ScriptDirectory.from_config(cfg).get_heads())
+
+
+def test_upgrades_once_then_only_checks(fresh_engine, monkeypatch):
+    assert mos.current_revisions(fresh_engine) is None
+    mos.run_migrations_if_enabled(fresh_engine)
+    assert mos.current_revisions(fresh_engine) == mos.head_revisions()
+
+    def _fail(engine):
+        raise AssertionError("upgrade should not run at head")
+
+    statements = []
+    event.listen(fresh_engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    monkeypatch.setattr(mos, "_upgrade", _fail)
+    monkeypatch.setattr(mos, "_at_head", False)
+    mos.run_migrations_if_enabled(fresh_engine)
+    assert statements == ["SELECT version_num FROM alembic_version"]
+
+    # Cached for the rest of the process (and for workers forked from it).
+    mos.run_migrations_if_enabled(fresh_engine)
+    assert len(statements) == 1
+
+
+def test_check_mode_refuses_to_start_behind_head(fresh_engine, monkeypatch):
+    monkeypatch.setenv("RUN_MIGRATIONS", "check")
+    with pytest.raises(RuntimeError, match="not at head"):
+        mos.run_migrations_if_enabled(fresh_engine)
+    assert mos.current_revisions(fresh_engine) is None
+
+
+def test_app_import_time():
+    code = (
+        f"import sys, time; import {FRAMEWORK}; t = time.perf_counter(); import app.main; "
+        f"print(time.perf_counter() - t, *(m in sys.modules for m in {DEFERRED!r}))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=mos.PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+        env={"RUN_MIGRATIONS": "0", "PATH": ""},
+    ).stdout.split()
+    print(f"import app.main on top of the framework: {float(out[0]) * 1000:.0f} ms")
+    assert dict(zip(DEFERRED, out[1:])) == dict.fromkeys(DEFERRED, "False")
+    assert float(out[0]) < APP_IMPORT_BUDGET_SECS
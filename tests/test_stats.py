@@ -0,0 +1,39 @@
+from sqlalchemy import text
+
+from app import stats
+
+
+def _tag(client, tag):
+    body = client.get("/tasks/stats").json()
+    return next((t for t in body["tags"] if t["tag"] == tag), None), body
+
+
+def test_stats_follow_every_write_path(test_client):
+    ids = [
+        test_client.post("/tasks/", json={"title": f"s{i}", "tag": "st-a"}).json()["id"]
+        for i in range(3)
+    ]
+    test_client.post("/tasks/bulk", json=[{"title": "b", "tag": "st-a"}])
+    test_client.patch(f"/tasks/{ids[0]}/complete")
+    test_client.put(f"/tasks/{ids[1]}", json={"title": "moved", "tag": "st-b"})
+    test_client.delete(f"/tasks/{ids[2]}")
+
+    a, body = _tag(test_client, "st-a")
+    assert a == {"tag": "st-a", "total": 2, "completed": 1, "open": 1}
+    b, _ = _tag(test_client, "st-b")
+    assert b == {"tag": "st-b", "total": 1, "completed": 0, "open": 1}
+    assert body["total"] == body["completed"] + body["open"]
+    assert body["total"] == sum(t["total"] for t in body["tags"])
+
+
+def test_check_and_rebuild(test_client, session):
+    test_client.post("/tasks/", json={"title": "drift", "tag": "st-drift"})
+    assert stats.check(session) == []
+
+    session.exec(text("UPDATE task_stats SET total = 99 WHERE tag = 'st-drift'"))
+    session.commit()
+    assert stats.check(session) == [("st-drift", (1, 0), (99, 0))]
+
+    stats.rebuild(session)
+    assert stats.check(session) == []
+    assert _tag(test_client, "st-drift")[0]["total"] == 1
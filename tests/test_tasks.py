@@ -1,3 +1,10 @@
+import base64
+
+from sqlmodel import select
+
+from app import crud
+
+
 def status_ok(code: int) -> bool:
     return code in (200, 201)
 
@@ -72,3 +79,104 @@ def test_404s_and_validation(test_client):
 
     r = test_client.post("/tasks/", json={"description": "no title"})
     assert r.status_code in (400, 422)
+
+
+def test_cursor_pagination(test_client):
+    ids = [
+        test_client.post("/tasks/", json={"title": f"Page {i}", "tag": "cursor"}).json()["id"]
+        for i in range(5)
+    ]
+
+    r = test_client.get("/tasks/?tag=cursor&page_size=2&cursor=")
+    assert [t["id"] for t in r.json()] == ids[:2]
+    seen = [t["id"] for t in r.json()]
+    while "x-next-cursor" in r.headers:
+        r = test_client.get(f"/tasks/?tag=cursor&page_size=2&cursor={r.headers['x-next-cursor']}")
+        assert r.status_code == 200
+        seen += [t["id"] for t in r.json()]
+    assert seen == ids
+
+    r = test_client.get("/tasks/?tag=cursor&page_size=2&page=2")
+    assert [t["id"] for t in r.json()] == ids[2:4]
+
+    r = test_client.get("/tasks/?cursor=not-a-cursor")
+    assert r.status_code == 400
+    for bad in ('{"id":1e999}', '{"id":9223372036854775808}', '{"id":-1}'):
+        cursor = base64.urlsafe_b64encode(bad.encode()).decode()
+        assert test_client.get("/tasks/", params={"cursor": cursor}).status_code == 400
+
+
+def test_list_matches_task_schema(test_client):
+    created = test_client.post("/tasks/", json={"title": "Shape", "tag": "shape-check"}).json()
+    r = test_client.get("/tasks/", params={"tag": "shape-check"})
+    assert r.status_code == 200
+    assert r.json() == [created]
+
+    schema = test_client.get("/openapi.json").json()
+    ok = schema["paths"]["/tasks/"]["get"]["responses"]["200"]["content"]["application/json"]
+    assert ok["schema"]["items"]["$ref"].endswith("/TaskOut")
+
+
+def test_sparse_fields(test_client):
+    for i in range(3):
+        test_client.post(
+            "/tasks/", json={"title": f"sp{i}", "description": "x" * 500, "tag": "sparse"}
+        )
+    full = test_client.get("/tasks/", params={"tag": "sparse"})
+
+    r = test_client.get("/tasks/", params={"tag": "sparse", "fields": "title, completed"})
+    assert r.json() == [
+        {"id": t["id"], "title": t["title"], "completed": False} for t in full.json()
+    ]
+    # Same rows, different representation: the validators must not collide.
+    assert r.headers["etag"] != full.headers["etag"]
+    again = test_client.get(
+        "/tasks/",
+        params={"tag": "sparse", "fields": "completed,title"},
+        headers={"If-None-Match": r.headers["etag"]},
+    )
+    assert again.status_code == 304
+
+    stmt = str(crud._page_statement(select(*crud.list_columns(("title",))), "sqlite"))
+    assert "description" not in stmt
+
+    r = test_client.get("/tasks/", params={"fields": "title,secret"})
+    assert r.status_code == 400
+    assert "secret" in r.json()["detail"]
+
+
+def test_include_total(test_client, monkeypatch):
+    for i in range(5):
+        test_client.post("/tasks/", json={"title": f"zephyrine {i}", "tag": "totals"})
+
+    r = test_client.get("/tasks/", params={"tag": "totals", "page_size": 2, "include_total": True})
+    assert r.headers["x-total-count"] == "5"
+    assert (r.headers["x-total-count-accuracy"], r.headers["x-total-count-source"]) == (
+        "exact",
+        "stats",
+    )
+    assert "x-total-count" not in test_client.get("/tasks/", params={"tag": "totals"}).headers
+
+    params = {"search": "zephyrine", "page_size": 2, "include_total": True}
+    r = test_client.get("/tasks/", params=params)
+    assert (r.headers["x-total-count"], r.headers["x-total-count-source"]) == ("5", "count")
+    monkeypatch.setattr(crud, "WINDOW_COUNT_DIALECTS", ("sqlite",))
+    r = test_client.get("/tasks/", params={**params, "completed": False})
+    assert (r.headers["x-total-count"], r.headers["x-total-count-source"]) == ("5", "window")
+    assert len(r.json()) == 2 and "total_count" not in r.json()[0]
+    r = test_client.get("/tasks/", params={**params, "page": 2})
+    assert (r.headers["x-total-count"], r.headers["x-total-count-source"]) == ("5", "cache")
+    r = test_client.get("/tasks/", params={**params, "page": 9, "search": "zephyrine 1"})
+    assert (r.headers["x-total-count"], r.headers["x-total-count-source"]) == ("1", "count")
+
+
+def test_total_is_part_of_the_list_etag(test_client):
+    test_client.post("/tasks/", json={"title": "first", "tag": "total-etag"})
+    params = {"tag": "total-etag", "page_size": 1, "include_total": True}
+    etag = test_client.get("/tasks/", params=params).headers["etag"]
+    test_client.post("/tasks/", json={"title": "second", "tag": "total-etag"})
+
+    # Same first page, but the total moved: the cached copy must not be revalidated.
+    r = test_client.get("/tasks/", params=params, headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["x-total-count"] == "2"